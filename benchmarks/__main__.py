@@ -0,0 +1,83 @@
+"""
+Microbenchmarks for the transform/load hot paths.
+
+    python -m benchmarks --rows 100000 --width 40 --depth 3
+    python -m benchmarks --save-baseline        # record the current numbers
+    python -m benchmarks --threshold 0.2        # exit 1 on a >20% regression
+"""
+
+import argparse
+import os
+import sys
+
+from .generators import generate_records
+from .hot_paths import (
+    baseline_key,
+    build_stages,
+    compare,
+    load_baselines,
+    measure,
+    save_baselines,
+)
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baselines.json")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--width", type=int, default=30, help="Fields per record")
+    parser.add_argument("--depth", type=int, default=2, help="Nesting depth")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--stages", help="Comma-separated subset of stages to run")
+    parser.add_argument("--dsn", help="Database for to_sql (default: in-memory SQLite)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument(
+        "--threshold", type=float, default=0.2, help="Allowed regression ratio"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+
+    stages = build_stages(args.dsn)
+    if args.stages:
+        selected = {name.strip() for name in args.stages.split(",")}
+        stages = [stage for stage in stages if stage.name in selected]
+
+    records = generate_records(args.rows, args.width, args.depth)
+    baselines = load_baselines(args.baseline)
+
+    print(f"{args.rows} rows, width {args.width}, depth {args.depth}")
+    print(f"{'stage':<12} {'seconds':>10} {'peak MiB':>10}  status")
+
+    failed = False
+    for stage in stages:
+        key = baseline_key(stage.name, args.rows, args.width, args.depth)
+        result = measure(stage, records, args.repeat)
+        regressions = compare(result, baselines.get(key), args.threshold)
+
+        if args.save_baseline:
+            baselines[key] = result
+            status = "saved"
+        elif regressions:
+            failed = True
+            status = "REGRESSION " + "; ".join(regressions)
+        else:
+            status = "ok" if key in baselines else "no baseline"
+
+        print(
+            f"{stage.name:<12} {result['seconds']:>10.4f} "
+            f"{result['peak_bytes'] / 2**20:>10.2f}  {status}"
+        )
+
+    if args.save_baseline:
+        save_baselines(args.baseline, baselines)
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
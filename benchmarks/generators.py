@@ -0,0 +1,55 @@
+import random
+import string
+from typing import Optional
+
+from src.utils.constants import BLACK_LIST
+
+
+def random_text(rng: random.Random, size: int = 12) -> str:
+    return "".join(rng.choices(string.ascii_letters + " ", k=size))
+
+
+def nested_block(rng: random.Random, depth: int, width: int) -> dict:
+    """A dict nested ``depth`` levels, like Omie's info/endereco/dadosBancarios"""
+    block = {f"campo_{i}": random_text(rng, 8) for i in range(width)}
+    if depth > 1:
+        block["detalhes"] = nested_block(rng, depth - 1, width)
+    return block
+
+
+def generate_records(
+    rows: int,
+    width: int = 30,
+    depth: int = 2,
+    seed: Optional[int] = 42,
+) -> list:
+    """
+    Synthetic Omie-shaped records (``clientes_cadastro`` style).
+
+    Args:
+        rows (int): Number of records.
+        width (int): Number of flat fields per record (also the width of each
+            nested block).
+        depth (int): Nesting depth of the ``info`` block (0 for flat records).
+        seed (int): Random seed, so baselines compare the same data.
+    """
+    rng = random.Random(seed)
+    records = []
+    for row in range(rows):
+        record = {
+            "codigo_cliente_omie": 1_000_000 + row,
+            "codigo_cliente_integracao": f"INT{row:08d}",
+            "razao_social": random_text(rng, 30),
+            "nValorDocumento": f"{rng.uniform(0, 100_000):.2f}",
+            "nSaldo": f"{rng.uniform(-5_000, 5_000):.2f}",
+            "inativo": rng.choice(["S", "N"]),
+        }
+        for i in range(max(width - len(record), 0)):
+            record[f"campo_{i}"] = random_text(rng)
+        if depth > 0:
+            record["info"] = nested_block(rng, depth, max(width // 5, 1))
+        # Blacklisted fields, as sent by the API
+        for field in BLACK_LIST:
+            record[field] = [{"tag": random_text(rng, 6)}] if field == "tags" else "N"
+        records.append(record)
+    return records
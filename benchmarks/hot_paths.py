@@ -0,0 +1,145 @@
+import json
+import os
+import time
+import tracemalloc
+import warnings
+from dataclasses import dataclass
+from datetime import date
+from typing import Callable, Optional
+
+import pandas as pd
+from sqlalchemy import create_engine
+
+from src.db.changes import hash_rows
+from src.db.database import coerce_types, normalize_content, sql_types
+from src.utils.tools import (
+    generate_date_range,
+    get_body_params_pagination,
+    remove_blacklisted_fields,
+)
+
+RECORDS_PER_PAGE = 100
+MIN_SECONDS = 0.001  # Time differences below this are noise, never regressions
+
+
+@dataclass
+class Stage:
+    """A hot path measured in isolation; ``setup`` is not timed"""
+
+    name: str
+    run: Callable
+    setup: Callable = lambda records: (records,)
+
+
+def copy_records(records: list) -> tuple:
+    # Stripping only deletes top-level keys, so a shallow copy per record is enough
+    return ([dict(record) for record in records],)
+
+
+def stripped_records(records: list) -> tuple:
+    return (remove_blacklisted_fields([dict(record) for record in records]),)
+
+
+def normalized_frame(records: list) -> tuple:
+    return (coerce_types(normalize_content(stripped_records(records)[0])),)
+
+
+def body_params(records: list) -> None:
+    params = {"pagina": 1, "registros_por_pagina": RECORDS_PER_PAGE}
+    for page in range(1, len(records) // RECORDS_PER_PAGE + 2):
+        get_body_params_pagination("ListarClientes", params, page, "pagina")
+
+
+def normalize(records: list) -> pd.DataFrame:
+    return coerce_types(normalize_content(records))
+
+
+def date_range(records: list) -> None:
+    # Ten years of monthly windows, as many times as there are pages
+    start = f"01/01/{date.today().year - 10}"
+    for _ in range(len(records) // RECORDS_PER_PAGE + 1):
+        generate_date_range(start)
+
+
+def build_stages(dsn: Optional[str] = None) -> list:
+    engine = create_engine(dsn or "sqlite://")
+    is_sqlite = engine.dialect.name == "sqlite"
+
+    def to_sql(df: pd.DataFrame) -> None:
+        # SQLite caps bound parameters per statement; Postgres uses the loader's chunksize
+        chunksize = max(32_000 // len(df.columns), 1) if is_sqlite else 1000
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            df.to_sql(
+                "benchmark_to_sql",
+                engine,
+                if_exists="replace",
+                index=False,
+                method="multi",
+                chunksize=chunksize,
+                dtype=sql_types(df.columns),
+            )
+
+    return [
+        Stage("body_params", body_params),
+        Stage("blacklist", remove_blacklisted_fields, copy_records),
+        Stage("normalize", normalize, stripped_records),
+        Stage("row_hash", hash_rows, normalized_frame),
+        Stage("to_sql", to_sql, normalized_frame),
+        Stage("date_range", date_range),
+    ]
+
+
+def measure(stage: Stage, records: list, repeat: int) -> dict:
+    """Best wall time of ``repeat`` runs plus the peak allocation of one more run"""
+    times = []
+    for _ in range(repeat):
+        args = stage.setup(records)
+        started = time.perf_counter()
+        stage.run(*args)
+        times.append(time.perf_counter() - started)
+
+    args = stage.setup(records)
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    stage.run(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {"seconds": min(times), "peak_bytes": peak}
+
+
+def baseline_key(stage: str, rows: int, width: int, depth: int) -> str:
+    return f"{stage}|rows={rows}|width={width}|depth={depth}"
+
+
+def load_baselines(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as file:
+        return json.load(file)
+
+
+def save_baselines(path: str, baselines: dict) -> None:
+    with open(path, "w") as file:
+        json.dump(baselines, file, indent=4, sort_keys=True)
+        file.write("\n")
+
+
+def compare(result: dict, baseline: Optional[dict], threshold: float) -> list:
+    """Returns the metrics of ``result`` that regressed beyond ``threshold``"""
+    if not baseline:
+        return []
+
+    regressions = []
+    for metric in ("seconds", "peak_bytes"):
+        before, after = baseline.get(metric), result[metric]
+        if not before:
+            continue
+        if metric == "seconds" and after - before < MIN_SECONDS:
+            continue
+        if after > before * (1 + threshold):
+            regressions.append(
+                f"{metric} {before:.4g} -> {after:.4g} (+{after / before - 1:.0%})"
+            )
+    return regressions
@@ -4,7 +4,6 @@ from airflow import DAG
 from airflow.operators.dummy import DummyOperator
 from airflow.operators.python import PythonOperator
 from airflow.utils.task_group import TaskGroup
-from loguru import logger
 
 default_args = {
     "owner": "airflow",
@@ -32,7 +31,10 @@ def get_cutomers(endpoint: dict):
     total_of_pages_label = endpoint.get("total_of_pages_label", None)
     records_label = endpoint.get("records_label", "registros")
 
-    pagination = PaginationController()
+    pagination = PaginationController(
+        batch_rows=endpoint.get("batch_rows", None),
+        batch_bytes=endpoint.get("batch_bytes", None),
+    )
 
     if pagination_type == "date_range":
         depends_on = endpoint.get("depends_on", None)
@@ -42,42 +44,39 @@ def get_cutomers(endpoint: dict):
 
             db = Database()
 
-            try:
-                accounts = db.select_from_table(
-                    table_name=depends_on, distinct_column="nCodCC"
-                )
-            except Exception as e:
-                logger.error(
-                    f"An error occurred while selecting from the table '{depends_on}': {e}"
-                )
+            accounts = db.select_from_table(
+                table_name=depends_on, distinct_column="nCodCC"
+            )
+            if accounts is None:
+                raise RuntimeError(f"Could not read accounts from '{depends_on}'")
 
+            # Failed windows stay in the ledger so every account is attempted;
+            # the task fails afterwards if any window is still missing
             for account in accounts:
                 params["nCodCC"] = account
 
-                try:
-                    pagination.pagination(
-                        type=pagination_type,
-                        resource=resource,
-                        action=action,
-                        params=params,
-                        data_source=data_source,
-                    )
-                except Exception as e:
-                    logger.error(f"An error occurred while pagination: {e}")
+                pagination.pagination(
+                    type=pagination_type,
+                    resource=resource,
+                    action=action,
+                    params=params,
+                    data_source=data_source,
+                    partitioned=endpoint.get("partitioned", False),
+                )
+            pagination.ledger.raise_for_pending(action)
     else:
-        try:
-            pagination.pagination(
-                type=pagination_type,
-                resource=resource,
-                action=action,
-                params=params,
-                data_source=data_source,
-                page_label=page_label,
-                total_of_pages_label=total_of_pages_label,
-                records_label=records_label,
-            )
-        except Exception as e:
-            logger.error(f"An error occurred while pagination: {e}")
+        # IncompleteExtractionError propagates so Airflow marks the task failed
+        pagination.pagination(
+            type=pagination_type,
+            resource=resource,
+            action=action,
+            params=params,
+            data_source=data_source,
+            page_label=page_label,
+            total_of_pages_label=total_of_pages_label,
+            records_label=records_label,
+            natural_key=endpoint.get("natural_key", None),
+        )
 
 
 with DAG(
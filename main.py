@@ -1,27 +1,16 @@
-from src.controllers.paginations import PaginationController
+from src.controllers.tenants import TenantsController
 from src.endpoints import Endpoints
 
 endpoints = Endpoints()
 endpoints = endpoints.get_all()
 
-for endpoint in endpoints:
-    resource = endpoint.get("resources", None)
-    action = endpoint.get("action", None)
-    params = endpoint.get("params", None)
-    data_source = endpoint.get("data_source", None)
-    pagination_type = endpoint.get("pagination_type", "per_page")
-    page_label = endpoint.get("page_label", None)
-    total_of_pages_label = endpoint.get("total_of_pages_label", None)
-    records_label = endpoint.get("records_label", "registros")
+# One tenant per company in TENANTS_FILE, or APP_KEY / APP_SECRET alone
+tenants = TenantsController(endpoints)
+failed = tenants.run()
 
-    pagination = PaginationController()
-    pagination = pagination.pagination(
-        type=pagination_type,
-        resource=resource,
-        action=action,
-        params=params,
-        data_source=data_source,
-        page_label=page_label,
-        total_of_pages_label=total_of_pages_label,
-        records_label=records_label,
+failed = {name: actions for name, actions in failed.items() if actions}
+if failed:
+    raise SystemExit(
+        "Endpoints failed: "
+        + "; ".join(f"{name}: {', '.join(sorted(a))}" for name, a in failed.items())
     )
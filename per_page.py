@@ -33,4 +33,6 @@ for endpoint in endpoints:
                     action=action,
                     params=params,
                     data_source=data_source,
+                    partitioned=endpoint.get("partitioned", False),
                 )
+            pagination.ledger.raise_for_pending(action)
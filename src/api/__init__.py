@@ -1 +1,2 @@
-from .api_instance import Api
+from .api_instance import Api, ApiResponseError
+from .latency import LatencyTracker, hedged_request, latency_tracker
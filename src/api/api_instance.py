@@ -1,4 +1,7 @@
-from typing import Callable, Union
+import os
+import threading
+import time
+from typing import Callable, Optional, Union
 
 import requests
 from loguru import logger
@@ -6,11 +9,24 @@ from requests.adapters import HTTPAdapter
 from requests.exceptions import RequestException
 from urllib3.util.retry import Retry
 
+from src.config import Settings
+
+from .latency import latency_tracker
+
+settings = Settings()
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class ApiResponseError(Exception):
+    """Raised when the API answers with something other than a JSON object"""
+
 
 class Session:
     """Manages HTTP session with retry mechanism."""
 
-    def __init__(self) -> None:
+    def __init__(self, pool_maxsize: int = 10) -> None:
         self._session = requests.Session()
         self.retry = Retry(
             connect=1,
@@ -21,7 +37,8 @@ class Session:
             allowed_methods=["GET", "POST", "PUT", "DELETE"],
             respect_retry_after_header=True,
         )
-        self.adapter = HTTPAdapter(max_retries=self.retry)
+        # One kept-alive connection per concurrent worker
+        self.adapter = HTTPAdapter(max_retries=self.retry, pool_maxsize=pool_maxsize)
         self._session.mount("http://", self.adapter)
         self._session.mount("https://", self.adapter)
 
@@ -29,6 +46,29 @@ class Session:
         return self._session
 
 
+def get_session() -> requests.Session:
+    """
+    Returns the process-wide HTTP session, so every request (of every tenant,
+    hedges included) reuses the same pool of kept-alive connections.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = Session(pool_maxsize=settings.SCHEDULER_MAX_WORKERS).get()
+        return _session
+
+
+def reset_session_after_fork() -> None:
+    """A forked child must not share the parent's sockets"""
+    global _session, _session_lock
+    _session_lock = threading.Lock()
+    _session = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=reset_session_after_fork)
+
+
 class Api:
     def __init__(
         self,
@@ -37,6 +77,8 @@ class Api:
         params: dict = None,
         json: dict = None,
         proxies: dict = None,
+        timeout: Optional[float] = None,
+        latency_key: Optional[str] = None,
     ) -> None:
         self.url = url
         self.headers = headers
@@ -44,8 +86,11 @@ class Api:
         self.json = json
         self.verify = True
         self.proxies = proxies
-        self.session = Session().get()
-        self.timeout = 30
+        self.session = get_session()
+        self.timeout = timeout or 30
+        # When set, request latencies are recorded under this key so that
+        # later calls can derive adaptive timeouts from them
+        self.latency_key = latency_key
 
     def get(self) -> Union[requests.Response, None]:
         response = self.session.get(
@@ -93,8 +138,11 @@ class Api:
         )
 
     def request(self, method: Callable) -> Union[dict, str, None]:
+        started = time.perf_counter()
         try:
             response = method()
+            if self.latency_key:
+                latency_tracker.observe(self.latency_key, time.perf_counter() - started)
             if 200 <= response.status_code < 300:
                 try:
                     return response.json()
@@ -109,4 +157,9 @@ class Api:
                 )
                 return response.text
         except RequestException as error:
+            if self.latency_key:
+                # Capped at p99: hung requests must not stretch the timeout
+                latency_tracker.observe_failure(
+                    self.latency_key, time.perf_counter() - started
+                )
             return logger.error(f"Request failed: {error}")
@@ -0,0 +1,143 @@
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import Executor
+from typing import Callable, Optional
+
+from loguru import logger
+
+
+class LatencyTracker:
+    """
+    Keeps a rolling window of request latencies per key (usually the endpoint
+    action) and derives adaptive timeouts and hedge delays from it.
+    """
+
+    def __init__(
+        self,
+        window: int = 200,
+        min_samples: int = 20,
+        default_timeout: float = 30,
+        min_timeout: float = 5,
+        max_timeout: float = 120,
+        timeout_factor: float = 3.0,
+    ) -> None:
+        self.min_samples = min_samples
+        self.default_timeout = default_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.timeout_factor = timeout_factor
+        self._samples = defaultdict(lambda: deque(maxlen=window))
+        self._lock = threading.Lock()
+
+    def observe(self, key: str, seconds: float) -> None:
+        with self._lock:
+            self._samples[key].append(seconds)
+
+    def observe_failure(self, key: str, seconds: float) -> None:
+        """
+        Records a failed request capped at the current p99, or not at all while
+        it is unknown. A timed-out request only says the answer took longer
+        than the timeout; recording that would raise the next timeout, which
+        then feeds on itself.
+        """
+        p99 = self.percentile(key, 99)
+        if p99 is not None:
+            self.observe(key, min(seconds, p99))
+
+    def percentile(self, key: str, q: float) -> Optional[float]:
+        """Return the q-th percentile (0-100) or None while there are too few samples"""
+        with self._lock:
+            samples = sorted(self._samples.get(key, ()))
+
+        if len(samples) < self.min_samples:
+            return None
+
+        index = min(int(round(q / 100 * (len(samples) - 1))), len(samples) - 1)
+        return samples[index]
+
+    def timeout(self, key: str) -> float:
+        """Timeout = p99 x timeout_factor, clamped to [min_timeout, max_timeout]"""
+        p99 = self.percentile(key, 99)
+        if p99 is None:
+            return self.default_timeout
+
+        return min(max(p99 * self.timeout_factor, self.min_timeout), self.max_timeout)
+
+    def hedge_delay(self, key: str) -> Optional[float]:
+        """Time to wait before re-issuing a request (p95), None if unknown yet"""
+        return self.percentile(key, 95)
+
+
+latency_tracker = LatencyTracker()
+
+
+def hedged_request(build_api: Callable, hedge_after: float, executor: Executor):
+    """
+    Sends a POST and, if it has not answered after ``hedge_after`` seconds,
+    submits an identical one to ``executor``. The first JSON response wins;
+    the other request finishes in the background and is ignored. Only safe for
+    read-only calls such as the Omie ``Listar*``.
+
+    The primary runs on its own thread while the calling worker waits, so it
+    uses the caller's slot of the worker budget; the hedge goes through the
+    caller's (shared) executor and only starts when a worker is free.
+
+    Args:
+        build_api (Callable): Factory returning a fresh ``Api`` for each attempt.
+        hedge_after (float): Seconds to wait before issuing the hedge.
+        executor (Executor): Pool the hedge runs in.
+    """
+    answered = threading.Event()
+    lock = threading.Lock()
+    results = {}  # "primary" / "hedge" -> response
+    state = {"finished": False, "hedge": None}
+
+    def attempt(name: str, api) -> None:
+        response = None
+        try:
+            response = api.request(api.post)
+        finally:
+            with lock:
+                results[name] = response
+            answered.set()
+
+    primary = build_api()
+    threading.Thread(
+        target=attempt, args=("primary", primary), name="omie-primary", daemon=True
+    ).start()
+
+    def fire():
+        with lock:
+            if state["finished"]:
+                return
+            logger.debug(f"Hedging request to {primary.url} after {hedge_after:.2f}s")
+            state["hedge"] = executor.submit(attempt, "hedge", build_api())
+
+    timer = threading.Timer(hedge_after, fire)
+    timer.daemon = True
+    timer.start()
+
+    try:
+        while True:
+            answered.wait()
+            with lock:
+                answered.clear()
+                for response in results.values():
+                    if isinstance(response, dict):
+                        return response
+
+                hedge = state["hedge"]
+                if "primary" in results and (hedge is None or "hedge" in results):
+                    return results["primary"]
+                # A hedge still queued is dropped: waiting for a free worker
+                # from inside one could deadlock the pool. A failed primary is
+                # retried by the caller.
+                if "primary" in results and hedge.cancel():
+                    return results["primary"]
+    finally:
+        timer.cancel()
+        with lock:
+            state["finished"] = True
+            hedge = state["hedge"]
+        if hedge is not None:
+            hedge.cancel()  # Only succeeds while it is still queued
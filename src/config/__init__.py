@@ -2,15 +2,28 @@ from pydantic_settings import BaseSettings
 
 
 class Settings(BaseSettings):
-    APP_KEY: str
-    APP_SECRET: str
+    APP_KEY: str = ""  # Single-company runs; see TENANTS_FILE for many
+    APP_SECRET: str = ""
     BASE_URL: str
     DB_HOST: str
     DB_PORT: int
     DB_USERNAME: str
     DB_PASSWORD: str
     DB_NAME: str
+    DB_POOL_SIZE: int = 5  # Match the number of concurrent writers
+    DB_MAX_OVERFLOW: int = 10
     DATE_INIT: str = "01/01/2025"
+    SCHEDULER_MAX_WORKERS: int = 10
+    HEDGE_TAIL_PAGES: int = 3  # 0 disables hedged requests
+    PARTITION_FREEZE_MONTHS: int = 3  # 0 never freezes past partitions
+    SINKS: str = "postgres"  # Comma-separated: postgres, parquet
+    PARQUET_PATH: str = "data/parquet"
+    BATCH_MAX_ROWS: int = 5000  # Write a batch once it holds this many rows
+    BATCH_MAX_BYTES: int = 32 * 1024 * 1024  # ...or this many payload bytes
+    MEMORY_CEILING_BYTES: int = 256 * 1024 * 1024  # Held by buffered rows, 0 = off
+    TENANTS_FILE: str = "tenants.json"
+    TENANT_REQUESTS_PER_MINUTE: int = 240  # Per app_key, 0 disables the limit
+    TENANT_CONCURRENCY: int = 4  # Tenants extracted at the same time
 
     class Config:
         env_file = ".env"
@@ -0,0 +1,146 @@
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Hashable, Optional
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an endpoint whose circuit breaker is open"""
+
+
+class IncompleteExtractionError(Exception):
+    """Raised when pages are still missing after the retry pass"""
+
+    def __init__(self, endpoint: str, failures: list) -> None:
+        self.endpoint = endpoint
+        self.failures = failures
+        keys = ", ".join(str(failure.key) for failure in failures[:10])
+        more = f" (+{len(failures) - 10} more)" if len(failures) > 10 else ""
+        super().__init__(
+            f"{endpoint}: {len(failures)} pages could not be fetched: {keys}{more}"
+        )
+
+
+@dataclass
+class FailedPage:
+    endpoint: str
+    key: Hashable  # page number, or (account, date) for date ranges
+    params: dict
+    error: str
+    attempts: int = 1
+    failed_at: float = field(default_factory=time.time)
+
+
+class FailureLedger:
+    """Thread-safe record of the pages that failed during a run"""
+
+    def __init__(self) -> None:
+        self._failures = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint: str, key: Hashable, params: dict, error: str):
+        with self._lock:
+            failure = self._failures.get((endpoint, key))
+            if failure:
+                failure.attempts += 1
+                failure.error = error
+                failure.failed_at = time.time()
+            else:
+                failure = FailedPage(endpoint, key, dict(params), error)
+                self._failures[(endpoint, key)] = failure
+            return failure
+
+    def resolve(self, endpoint: str, key: Hashable) -> bool:
+        """Drop a failure once its page has been fetched; True if it was recorded"""
+        with self._lock:
+            return self._failures.pop((endpoint, key), None) is not None
+
+    def pending(self, endpoint: Optional[str] = None) -> list:
+        with self._lock:
+            return [
+                failure
+                for failure in self._failures.values()
+                if endpoint is None or failure.endpoint == endpoint
+            ]
+
+    def raise_for_pending(self, endpoint: str) -> None:
+        failures = self.pending(endpoint)
+        if failures:
+            raise IncompleteExtractionError(endpoint, failures)
+
+    def __len__(self) -> int:
+        return len(self._failures)
+
+
+class CircuitBreaker:
+    """
+    Opens after ``failure_threshold`` consecutive failures and rejects calls for
+    ``reset_timeout`` seconds. After that a single probe call is let through
+    (half-open): success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 60) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self._condition = threading.Condition()
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def _allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        if self.probing or time.monotonic() - self.opened_at < self.reset_timeout:
+            return False
+        self.probing = True
+        return True
+
+    def allow(self) -> bool:
+        with self._condition:
+            return self._allow()
+
+    def acquire(self, timeout: float) -> bool:
+        """
+        Like ``allow`` but waits up to ``timeout`` seconds for the circuit to
+        close (or to accept a probe) instead of rejecting right away.
+        """
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while not self._allow():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                if not self.probing:
+                    # Open: nothing notifies when reset_timeout elapses
+                    reopens = self.reset_timeout - (time.monotonic() - self.opened_at)
+                    remaining = min(remaining, max(reopens, 0.01))
+                self._condition.wait(remaining)
+            return True
+
+    def record_success(self) -> None:
+        with self._condition:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+            self._condition.notify_all()
+
+    def record_failure(self) -> None:
+        with self._condition:
+            self.failures += 1
+            if self.probing or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self.probing = False
+            self._condition.notify_all()
+
+    def wait(self) -> None:
+        """Block until the circuit accepts a probe again"""
+        with self._condition:
+            if self.opened_at is None:
+                return
+            remaining = self.reset_timeout - (time.monotonic() - self.opened_at)
+        if remaining > 0:
+            time.sleep(remaining)
@@ -0,0 +1,106 @@
+import json
+import os
+import threading
+from typing import Optional
+
+from loguru import logger
+
+from src.config import Settings
+
+settings = Settings()
+
+# Parsed records take about 3.2x their JSON size in Python objects (measured
+# with benchmarks.generators), plus the DataFrame copies made while writing
+PYTHON_OVERHEAD = 4
+
+
+def estimate_size(contents) -> int:
+    """Approximate size in bytes of fetched records (their JSON encoding)"""
+    if not contents:
+        return 0
+    return len(json.dumps(contents, ensure_ascii=False, default=str).encode("utf-8"))
+
+
+def current_rss() -> Optional[int]:
+    """Resident memory of the process in bytes, None where it cannot be read"""
+    try:
+        import psutil
+
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+
+    try:
+        with open("/proc/self/statm", "r") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class MemoryBudget:
+    """
+    Process-wide ceiling on the memory held by fetched records waiting to be
+    written (including the copies made while writing them).
+
+    Buffered bytes times PYTHON_OVERHEAD are compared with the ceiling. The
+    growth of the process RSS since nothing was last buffered is an extra
+    signal, catching what the estimate misses; measuring growth rather than
+    absolute RSS matters because the interpreter keeps freed memory, so RSS
+    never comes back down after a large batch.
+
+    Fetch workers call ``wait_for_room`` before requesting a page, so fetching
+    pauses once the ceiling is reached and resumes below ``resume_ratio`` of
+    it; writers ``release`` the bytes once a batch has been written. Fetching
+    never waits while nothing is buffered. A ceiling of 0 disables it.
+    """
+
+    def __init__(
+        self, ceiling: int, resume_ratio: float = 0.8, poll_interval: float = 0.5
+    ) -> None:
+        self.ceiling = ceiling
+        self.resume_ratio = resume_ratio
+        self.poll_interval = poll_interval
+        self.used = 0
+        self.baseline_rss = None  # RSS when the first buffered bytes came in
+        self._condition = threading.Condition()
+
+    def reserve(self, nbytes: int) -> None:
+        with self._condition:
+            if not self.used and self.ceiling:
+                self.baseline_rss = current_rss()
+            self.used += nbytes
+
+    def release(self, nbytes: int) -> None:
+        with self._condition:
+            self.used = max(self.used - nbytes, 0)
+            self._condition.notify_all()
+
+    def memory_in_use(self) -> int:
+        """Estimated bytes held for buffered records"""
+        estimate = self.used * PYTHON_OVERHEAD
+        if self.baseline_rss is None:
+            return estimate
+
+        rss = current_rss()
+        growth = rss - self.baseline_rss if rss is not None else 0
+        return max(estimate, growth)
+
+    def over_ceiling(self, ratio: float = 1.0) -> bool:
+        if not self.ceiling or not self.used:
+            return False
+        return self.memory_in_use() >= self.ceiling * ratio
+
+    def wait_for_room(self) -> None:
+        with self._condition:
+            if not self.over_ceiling():
+                return
+            logger.debug(
+                f"Pausing fetch: {self.memory_in_use()} bytes held "
+                f"({self.used} buffered) over the {self.ceiling} ceiling"
+            )
+            # Memory also drops without a release (e.g. garbage collection)
+            while self.over_ceiling(self.resume_ratio):
+                self._condition.wait(self.poll_interval)
+
+
+memory_budget = MemoryBudget(settings.MEMORY_CEILING_BYTES)
@@ -1,28 +1,79 @@
 import calendar
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, Executor, ThreadPoolExecutor, wait
+from contextlib import nullcontext
 from datetime import datetime
-from typing import Literal
+from typing import Literal, Optional
 
 from loguru import logger
 
-from src.api import Api
+from src.api import Api, ApiResponseError, hedged_request, latency_tracker
 from src.config import Settings
-from src.db import Database
+from src.sinks import get_sinks
+from src.tenants import Tenant
 from src.utils.constants import HEADERS
 from src.utils.tools import (
     generate_date_range,
     get_body_params_pagination,
     get_total_of_pages,
+    remove_blacklisted_fields,
 )
 
+from .ledger import CircuitBreaker, CircuitOpenError, FailureLedger
+from .memory import estimate_size, memory_budget
+
 settings = Settings()
 
 
 class PaginationController:
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        executor: Optional[Executor] = None,
+        sinks: Optional[list] = None,
+        batch_rows: Optional[int] = None,
+        batch_bytes: Optional[int] = None,
+        tenant: Optional[Tenant] = None,
+    ) -> None:
         self.page = 1
-        self.batch_size = 10  # Number of pages to process in each batch
+        # A batch is written once it reaches either limit
+        self.batch_rows = batch_rows or settings.BATCH_MAX_ROWS
+        self.batch_bytes = batch_bytes or settings.BATCH_MAX_BYTES
         self.max_workers = 5  # Number of concurrent workers
+        # Shared executor (e.g. from SchedulerController); when None each
+        # call to per_page spins up its own pool of max_workers threads
+        self.executor = executor
+        self.retry_passes = 3  # Targeted re-fetch passes over failed pages
+        self.ledger = FailureLedger()
+        self.breakers = defaultdict(CircuitBreaker)  # One per action
+        self.replaced = set()  # Tables already replaced during this run
+        # Where fetched records are written; settings.SINKS when None
+        self.sinks = sinks
+        # Company whose credentials, rate limit and storage are used; the
+        # single company from the settings when None
+        self.tenant = tenant
+
+    def get_sinks(self) -> list:
+        if self.sinks is None:
+            self.sinks = get_sinks(self.tenant)
+        return self.sinks
+
+    def throttle(self) -> None:
+        """
+        Waits for the tenant's rate limit before sending a request, unless the
+        shared executor already starts tasks within that limit (FairExecutor),
+        in which case a worker must never sleep on it.
+        """
+        if self.tenant is None:
+            return
+        if getattr(self.executor, "rate_limiter", None) is self.tenant.rate_limiter:
+            return
+        self.tenant.rate_limiter.acquire()
+
+    def get_executor(self):
+        """Return the shared executor or a private pool owned by the caller"""
+        if self.executor is not None:
+            return nullcontext(self.executor)
+        return ThreadPoolExecutor(max_workers=self.max_workers)
 
     def fetch_page(
         self,
@@ -33,66 +84,202 @@ class PaginationController:
         page_label: str,
         data_source: str,
         records_label: str,
+        hedge: Optional[Executor] = None,
+        retrying: bool = False,
     ) -> tuple:
-        """Fetch a single page of data from the API"""
+        """
+        Fetch a single page of data from the API.
+
+        The timeout follows the latency observed for the action. When ``hedge``
+        is set (tail pages) a slow request is re-issued through that executor
+        and the first answer wins.
+        Waits first while the process memory budget is full. While
+        ``retrying`` an open circuit is waited on instead of rejecting the
+        page, and a page still rejected keeps its attempt count.
+
+        Returns:
+            tuple: (page, contents, size) where size is the approximate payload
+            size reserved in the memory budget; contents is None on failure.
+        """
+        memory_budget.wait_for_room()
+        breaker = self.breakers[action]
         try:
+            if retrying and not breaker.acquire(timeout=breaker.reset_timeout):
+                logger.warning(f"Circuit open for {action}, page {page} left for later")
+                return page, None, 0
+            if not retrying and not breaker.allow():
+                raise CircuitOpenError(f"Circuit open for {action}")
+
             params[page_label] = page
             body = get_body_params_pagination(
-                action=action, params=params, page=page, field_pagination=page_label
-            )
-
-            api = Api(
-                url=f"{settings.BASE_URL}{resource}",
-                headers=HEADERS,
-                json=body,
+                action=action,
                 params=params,
+                page=page,
+                field_pagination=page_label,
+                tenant=self.tenant,
             )
-            response = api.request(api.post)
+
+            def build_api() -> Api:
+                self.throttle()  # Hedged requests count against the limit too
+                return Api(
+                    url=f"{settings.BASE_URL}{resource}",
+                    headers=HEADERS,
+                    json=body,
+                    params=params,
+                    timeout=latency_tracker.timeout(action),
+                    latency_key=action,
+                )
+
+            hedge_after = latency_tracker.hedge_delay(action) if hedge else None
+            if hedge_after is not None:
+                response = hedged_request(build_api, hedge_after, hedge)
+            else:
+                api = build_api()
+                response = api.request(api.post)
+
+            if not isinstance(response, dict):
+                breaker.record_failure()
+                raise ApiResponseError(f"Unexpected response: {str(response)[:200]}")
+            breaker.record_success()
 
             records_fetched = response.get(records_label, 0)
-            contents = response.get(data_source, [])
-
-            # Remove blacklisted fields
-            black_list = [
-                "tags",
-                "recomendacoes",
-                "homepage",
-                "fax_ddd",
-                "bloquear_exclusao",
-                "produtor_rural",
-            ]
-            for content in contents:
-                for item in black_list:
-                    if item in content:
-                        del content[item]
+            contents = remove_blacklisted_fields(response.get(data_source, []))
+
+            size = estimate_size(contents)
+            memory_budget.reserve(size)
 
             logger.info(f"Page {page} has been fetched with {records_fetched} records.")
-            return page, contents
+            return page, contents, size
 
         except Exception as e:
-            logger.error(f"Error fetching page {page}: {e}")
-            return page, None
+            failure = self.ledger.record(action, page, params, str(e))
+            logger.error(
+                f"Error fetching page {page} of {action} (attempt {failure.attempts}): {e}"
+            )
+            return page, None, 0
+
+    def process_batch(
+        self, batch_pages: list, resource: str, sinks: list, action: str = None
+    ) -> None:
+        """
+        Process a batch of pages and write it to every sink.
 
-    def process_batch(self, batch_pages: list, resource: str, db: Database) -> None:
-        """Process a batch of pages and save to database"""
+        The first batch written for a resource in this run replaces the table,
+        whichever pages it holds. Pages that failed to fetch (``None``) are left
+        to the retry pass; if the write itself fails every page of the batch is
+        recorded in the ledger so it gets re-fetched too. The batch's bytes are
+        released from the memory budget either way.
+        """
+        pages = [page for page, contents, _ in batch_pages if contents is not None]
         try:
             all_contents = []
-            for page, contents in batch_pages:
+            for page, contents, _ in batch_pages:
                 if contents:
                     all_contents.extend(contents)
 
             if all_contents:
-                if batch_pages[0][0] == 1:  # First batch
-                    db.save_into_db(1, resource, all_contents, replace=True)
-                else:
-                    db.save_into_db(
-                        batch_pages[0][0], resource, all_contents, replace=False
+                replace = resource not in self.replaced
+                for sink in sinks:
+                    sink.write_batch(
+                        min(pages), resource, all_contents, replace=replace
                     )
+                self.replaced.add(resource)
 
         except Exception as e:
-            logger.error(
-                f"Error processing batch starting with page {batch_pages[0][0]}: {e}"
+            logger.error(f"Error processing batch with pages {sorted(pages)}: {e}")
+            for page in pages:
+                self.ledger.record(action, page, {}, f"Save failed: {e}")
+            return
+        finally:
+            memory_budget.release(sum(size for _, _, size in batch_pages))
+
+        for page in pages:
+            self.ledger.resolve(action, page)
+
+    def write_as_completed(
+        self, futures: list, resource: str, sinks: list, action: str
+    ) -> None:
+        """
+        Collects fetched pages into batches as they complete. A batch is written
+        once it holds batch_rows rows or batch_bytes bytes, or earlier when the
+        process memory budget is full so paused fetch workers can resume.
+        """
+        current_batch, rows, nbytes = [], 0, 0
+        pending = set(futures)
+
+        while pending:
+            done, pending = wait(pending, timeout=1, return_when=FIRST_COMPLETED)
+            for future in done:
+                page, contents, size = future.result()
+                current_batch.append((page, contents, size))
+                rows += len(contents or [])
+                nbytes += size
+
+                if rows >= self.batch_rows or nbytes >= self.batch_bytes:
+                    self.process_batch(current_batch, resource, sinks, action)
+                    current_batch, rows, nbytes = [], 0, 0
+
+            if current_batch and memory_budget.over_ceiling():
+                logger.debug(f"Memory ceiling reached, writing {rows} rows early")
+                self.process_batch(current_batch, resource, sinks, action)
+                current_batch, rows, nbytes = [], 0, 0
+
+        # Pages complete out of order, so flush whatever is left at the end
+        if current_batch:
+            self.process_batch(current_batch, resource, sinks, action)
+
+    def retry_failed_pages(
+        self,
+        resource: str,
+        action: str,
+        params: dict,
+        data_source: str,
+        page_label: str,
+        records_label: str,
+        sinks: list,
+    ) -> None:
+        """
+        Re-fetch only the pages recorded in the ledger and merge them in.
+
+        Each pass first sends a single probe page; the rest fan out only once
+        the probe has closed the circuit, so a half-open breaker does not
+        reject the whole pass.
+        """
+        breaker = self.breakers[action]
+        for retry_pass in range(1, self.retry_passes + 1):
+            failures = self.ledger.pending(action)
+            if not failures:
+                return
+
+            logger.warning(
+                f"Retrying {len(failures)} failed pages of {action} (pass {retry_pass})"
             )
+            breaker.wait()
+
+            with self.get_executor() as executor:
+
+                def submit(failure):
+                    return executor.submit(
+                        self.fetch_page,
+                        failure.key,
+                        resource,
+                        action,
+                        params.copy(),
+                        page_label,
+                        data_source,
+                        records_label,
+                        None,
+                        True,
+                    )
+
+                probe, rest = failures[0], failures[1:]
+                self.write_as_completed([submit(probe)], resource, sinks, action)
+                if breaker.is_open:
+                    logger.warning(f"Probe for {action} failed, circuit still open")
+                    continue
+
+                futures = [submit(failure) for failure in rest]
+                self.write_as_completed(futures, resource, sinks, action)
 
     def per_page(
         self,
@@ -103,17 +290,33 @@ class PaginationController:
         page_label: str = "pagina",
         total_of_pages_label: str = "total_de_paginas",
         records_label: str = "registros",
+        natural_key: Optional[list] = None,
     ):
-        total_of_pages = get_total_of_pages(
-            resource, action, params, page_label, total_of_pages_label, records_label
-        )
+        breaker = self.breakers[action]
+        if not breaker.allow():
+            raise CircuitOpenError(f"Circuit open for {action}")
+        try:
+            total_of_pages = get_total_of_pages(
+                resource,
+                action,
+                params,
+                page_label,
+                total_of_pages_label,
+                records_label,
+                self.tenant,
+            )
+        except ApiResponseError:
+            breaker.record_failure()
+            raise
+        breaker.record_success()
 
-        db = Database()
-        current_batch = []
+        sinks = self.get_sinks()
+        for sink in sinks:
+            sink.begin(resource, natural_key)
 
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+        with self.get_executor() as executor:
             # Submit all pages for processing
-            future_to_page = {
+            futures = [
                 executor.submit(
                     self.fetch_page,
                     page,
@@ -123,18 +326,26 @@ class PaginationController:
                     page_label,
                     data_source,
                     records_label,
-                ): page
+                    # Tail pages: hedges share the same worker budget
+                    (
+                        executor
+                        if page > total_of_pages - settings.HEDGE_TAIL_PAGES
+                        else None
+                    ),
+                )
                 for page in range(1, total_of_pages + 1)
-            }
+            ]
+            self.write_as_completed(futures, resource, sinks, action)
 
-            for future in as_completed(future_to_page):
-                page, contents = future.result()
-                current_batch.append((page, contents))
+        self.retry_failed_pages(
+            resource, action, params, data_source, page_label, records_label, sinks
+        )
 
-                # Process batch when it reaches batch_size or is the last batch
-                if len(current_batch) >= self.batch_size or page == total_of_pages:
-                    self.process_batch(current_batch, resource, db)
-                    current_batch = []
+        # 0 pages usually means an unexpected response, not an empty endpoint
+        complete = total_of_pages > 0 and not self.ledger.pending(action)
+        for sink in sinks:
+            sink.finish(resource, complete)
+        self.ledger.raise_for_pending(action)
 
     def pagination(
         self,
@@ -146,6 +357,8 @@ class PaginationController:
         page_label: str = "pagina",
         total_of_pages_label: str = "total_de_paginas",
         records_label: str = "registros",
+        partitioned: bool = False,
+        natural_key: Optional[list] = None,
     ):
         match type:
             case "per_page":
@@ -157,6 +370,7 @@ class PaginationController:
                     page_label=page_label,
                     total_of_pages_label=total_of_pages_label,
                     records_label=records_label,
+                    natural_key=natural_key,
                 )
             case "date_range":
                 return self.date_range(
@@ -165,29 +379,116 @@ class PaginationController:
                     params=params,
                     data_source=data_source,
                     date_init=settings.DATE_INIT,
+                    partitioned=partitioned,
                 )
 
     def date_range(
-        self, resource: str, action: str, params: dict, data_source: str, date_init: str
+        self,
+        resource: str,
+        action: str,
+        params: dict,
+        data_source: str,
+        date_init: str,
+        partitioned: bool = False,
     ):
         dates = generate_date_range(date_init)
 
         for date in dates:
-            date_obj = datetime.strptime(date, "%d/%m/%Y")
-            last_day = calendar.monthrange(date_obj.year, date_obj.month)[1]
-            end_of_month_date = date_obj.replace(day=last_day)
-            end_of_month_date = end_of_month_date.strftime("%d/%m/%Y")
+            self.fetch_window(resource, action, params, data_source, date, partitioned)
+
+        # Re-fetch only the windows of this account that failed
+        account = params.get("nCodCC")
+        for retry_pass in range(1, self.retry_passes + 1):
+            failures = [
+                failure
+                for failure in self.ledger.pending(action)
+                if failure.key[0] == account
+            ]
+            if not failures:
+                break
+
+            logger.warning(
+                f"Retrying {len(failures)} failed windows of {action} (pass {retry_pass})"
+            )
+            self.breakers[action].wait()
+            for failure in failures:
+                self.fetch_window(
+                    resource, action, params, data_source, failure.key[1], partitioned
+                )
+                if self.breakers[action].is_open:
+                    # The probe failed: later windows would only be rejected
+                    break
+
+    def fetch_window(
+        self,
+        resource: str,
+        action: str,
+        params: dict,
+        data_source: str,
+        date: str,
+        partitioned: bool = False,
+    ) -> None:
+        """
+        Fetch and save a single month, recording failures in the ledger.
+
+        When ``partitioned`` the month replaces its (period, account) partition
+        and frozen past months are skipped without calling the API. The month
+        is held in the memory budget until it has been written.
+        """
+        date_obj = datetime.strptime(date, "%d/%m/%Y")
+        last_day = calendar.monthrange(date_obj.year, date_obj.month)[1]
+        end_of_month_date = date_obj.replace(day=last_day)
+        end_of_month_date = end_of_month_date.strftime("%d/%m/%Y")
 
-            params["dPeriodoInicial"] = date
-            params["dPeriodoFinal"] = end_of_month_date
+        params["dPeriodoInicial"] = date
+        params["dPeriodoFinal"] = end_of_month_date
+
+        key = (params.get("nCodCC"), date)
+        breaker = self.breakers[action]
+        size = 0
+        try:
+            sinks = self.get_sinks()
+            if partitioned and all(
+                sink.is_window_frozen(resource, date_obj.date(), params.get("nCodCC"))
+                for sink in sinks
+            ):
+                logger.info(
+                    f"nCodCC: {params.get('nCodCC')} - Date {date} is frozen, skipping."
+                )
+                self.ledger.resolve(action, key)
+                return
+
+            memory_budget.wait_for_room()
+            if not breaker.allow():
+                raise CircuitOpenError(f"Circuit open for {action}")
 
             body = get_body_params_pagination(
                 action=action,
                 params=params,
+                tenant=self.tenant,
+            )
+
+            api = Api(
+                url=f"{settings.BASE_URL}{resource}",
+                headers=HEADERS,
+                json=body,
+                timeout=latency_tracker.timeout(action),
+                latency_key=action,
             )
+            self.throttle()
+            if self.executor is not None:
+                # Run through the shared pool so it counts against the budget
+                response = self.executor.submit(api.request, api.post).result()
+            else:
+                response = api.request(api.post)
+
+            if not isinstance(response, dict):
+                breaker.record_failure()
+                raise ApiResponseError(f"Unexpected response: {str(response)[:200]}")
+            breaker.record_success()
 
-            api = Api(url=f"{settings.BASE_URL}{resource}", headers=HEADERS, json=body)
-            response = api.request(api.post)
+            size = estimate_size(response.get(data_source))
+            memory_budget.reserve(size)
 
             records_fetched = len(response.get(f"{data_source}", 0))
 
@@ -195,9 +496,22 @@ class PaginationController:
                 f"nCodCC: {params['nCodCC']} - Date {date} at {end_of_month_date} has been fetched with {records_fetched} records."
             )
 
-            db = Database()
-            # Verificar este lance do parâmetro page em save_into_db
-            db.save_into_db(self.page, resource, response)
+            for sink in sinks:
+                if partitioned:
+                    sink.write_window(
+                        resource, response, date_obj.date(), params.get("nCodCC")
+                    )
+                else:
+                    # Verificar este lance do parâmetro page em save_into_db
+                    sink.write_batch(self.page, resource, response)
 
             self.page += 1
-            print(f"PAGE: {self.page}")
+            self.ledger.resolve(action, key)
+
+        except Exception as e:
+            failure = self.ledger.record(action, key, params, str(e))
+            logger.error(
+                f"Error fetching {action} for nCodCC {key[0]} at {date} (attempt {failure.attempts}): {e}"
+            )
+        finally:
+            memory_budget.release(size)
@@ -0,0 +1,2 @@
+from .fair_executor import FairExecutor, KeyedExecutor
+from .scheduler import SchedulerController
@@ -0,0 +1,163 @@
+import heapq
+import itertools
+import threading
+from collections import deque
+from concurrent.futures import Executor, Future
+from typing import Optional
+
+from src.tenants import RateLimiter
+
+
+class FairExecutor:
+    """
+    Thread pool whose tasks are queued per key (tenant) and served round-robin,
+    highest priority first within each key.
+
+    A plain ThreadPoolExecutor is FIFO, so a tenant that submits thousands of
+    pages at once would hold every worker until its backlog drains. Here each
+    key has its own queue and workers take one task from each key with pending
+    work in turn, so every tenant keeps progressing. Within a key, tasks run by
+    priority (the endpoint's critical-path priority) and then in submission
+    order, so an endpoint others depend on is not stuck behind the pages of
+    endpoints submitted earlier.
+
+    A key registered with a rate limiter only gets a turn when it has a token,
+    so a tenant over its limit waits in its queue instead of parking workers.
+    Every task of such a key is expected to send one request.
+    """
+
+    def __init__(self, max_workers: int, thread_name_prefix: str = "fair") -> None:
+        self.max_workers = max_workers
+        self.thread_name_prefix = thread_name_prefix
+        self.queues = {}  # key -> heap of (-priority, seq, (future, fn, args, kwargs))
+        self.ready = deque()  # keys with pending tasks, in serving order
+        self.limiters = {}  # key -> RateLimiter
+        self.threads = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._shutdown = False
+
+    def submit(self, key: str, fn, *args, priority: int = 0, **kwargs) -> Future:
+        future = Future()
+        with self._condition:
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new futures after shutdown")
+
+            queue = self.queues.setdefault(key, [])
+            if not queue:
+                self.ready.append(key)
+            heapq.heappush(
+                queue, (-priority, next(self._sequence), (future, fn, args, kwargs))
+            )
+
+            if len(self.threads) < self.max_workers:
+                thread = threading.Thread(
+                    target=self.worker,
+                    name=f"{self.thread_name_prefix}_{len(self.threads)}",
+                    daemon=True,
+                )
+                thread.start()
+                self.threads.append(thread)
+            self._condition.notify()
+        return future
+
+    def take_ready(self):
+        """
+        Pops a task from the first ready key that is within its rate limit.
+        Returns (task, None), or (None, seconds until a key gets a token).
+        """
+        next_token = None
+        for _ in range(len(self.ready)):
+            key = self.ready[0]
+            limiter = self.limiters.get(key)
+            wait = limiter.try_acquire() if limiter else 0
+            if not wait:
+                self.ready.popleft()
+                queue = self.queues[key]
+                _, _, task = heapq.heappop(queue)
+                if queue:
+                    self.ready.append(key)
+                return task, None
+
+            self.ready.rotate(-1)
+            next_token = wait if next_token is None else min(next_token, wait)
+        return None, next_token
+
+    def next_task(self):
+        with self._condition:
+            while True:
+                task, next_token = self.take_ready()
+                if task is not None:
+                    return task
+                if self._shutdown and not self.ready:
+                    return None
+                # Woken by a submit, or when the earliest limited key refills
+                self._condition.wait(next_token)
+
+    def worker(self) -> None:
+        while True:
+            task = self.next_task()
+            if task is None:
+                return
+
+            future, fn, args, kwargs = task
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+
+    def for_key(
+        self,
+        key: str,
+        rate_limiter: Optional[RateLimiter] = None,
+        priority: int = 0,
+    ) -> "KeyedExecutor":
+        """An Executor that submits every task under ``key``"""
+        if rate_limiter is not None:
+            with self._condition:
+                self.limiters[key] = rate_limiter
+        return KeyedExecutor(self, key, rate_limiter, priority)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stops the workers once every queued task has run"""
+        with self._condition:
+            self._shutdown = True
+            self._condition.notify_all()
+        if wait:
+            for thread in self.threads:
+                thread.join()
+
+    def __enter__(self) -> "FairExecutor":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.shutdown(wait=True)
+
+
+class KeyedExecutor(Executor):
+    """View of a FairExecutor for one key and priority; shutting it down is a no-op"""
+
+    def __init__(
+        self,
+        pool: FairExecutor,
+        key: str,
+        rate_limiter: Optional[RateLimiter] = None,
+        priority: int = 0,
+    ) -> None:
+        self.pool = pool
+        self.key = key
+        # Tasks only start within this limit, so they need not acquire it
+        self.rate_limiter = rate_limiter
+        self.priority = priority
+
+    def with_priority(self, priority: int) -> "KeyedExecutor":
+        """The same key, with tasks queued at ``priority``"""
+        return KeyedExecutor(self.pool, self.key, self.rate_limiter, priority)
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        return self.pool.submit(self.key, fn, *args, priority=self.priority, **kwargs)
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        pass
@@ -0,0 +1,235 @@
+from concurrent.futures import FIRST_COMPLETED, Executor, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+from copy import deepcopy
+from typing import Optional
+
+from loguru import logger
+
+from src.config import Settings
+from src.controllers.paginations import PaginationController
+from src.db import Database, get_engine, pool_stats
+from src.tenants import Tenant
+
+from .fair_executor import FairExecutor
+from src.utils.tools import get_table_name
+
+settings = Settings()
+
+
+class SchedulerController:
+    """
+    Runs the whole endpoint catalog as a DAG built from ``depends_on``.
+
+    Every endpoint whose dependencies are done runs concurrently, and all of
+    them fetch pages through one shared executor, so the request budget is
+    ``max_workers`` for the whole run instead of per endpoint. Priority is an
+    endpoint's own ``weight`` plus the heaviest chain of endpoints waiting on
+    it: ready endpoints start in that order and the executor runs their pages
+    by it too, so the critical path is never queued behind other pages.
+    """
+
+    def __init__(
+        self,
+        endpoints: list,
+        max_workers: Optional[int] = None,
+        tenant: Optional[Tenant] = None,
+    ) -> None:
+        self.endpoints = {endpoint["action"]: endpoint for endpoint in endpoints}
+        self.max_workers = max_workers or settings.SCHEDULER_MAX_WORKERS
+        self.tenant = tenant
+        self.label = f"[{tenant.name}] " if tenant else ""
+        self.dependencies = self.build_dependencies()
+        self.priorities = self.build_priorities()
+
+    def build_dependencies(self) -> dict:
+        """Map each action to the set of actions it depends on"""
+        tables = {
+            get_table_name(endpoint["resources"]): action
+            for action, endpoint in self.endpoints.items()
+        }
+
+        dependencies = {}
+        for action, endpoint in self.endpoints.items():
+            depends_on = endpoint.get("depends_on") or []
+            if isinstance(depends_on, str):
+                depends_on = [depends_on]
+
+            dependencies[action] = set()
+            for table_name in depends_on:
+                if table_name in tables:
+                    dependencies[action].add(tables[table_name])
+                else:
+                    logger.warning(
+                        f"{action} depends on '{table_name}', which is not loaded in this run"
+                    )
+
+        return dependencies
+
+    def build_priorities(self) -> dict:
+        """Priority = own weight + heaviest chain of dependents (critical path)"""
+        dependents = {action: set() for action in self.endpoints}
+        for action, dependencies in self.dependencies.items():
+            for dependency in dependencies:
+                dependents[dependency].add(action)
+
+        priorities = {}
+        visiting = set()
+
+        def visit(action: str) -> int:
+            if action in priorities:
+                return priorities[action]
+            if action in visiting:
+                raise ValueError(f"Cyclic dependency detected at endpoint {action}")
+
+            visiting.add(action)
+            downstream = max((visit(child) for child in dependents[action]), default=0)
+            visiting.discard(action)
+
+            priorities[action] = self.endpoints[action].get("weight", 1) + downstream
+            return priorities[action]
+
+        for action in self.endpoints:
+            visit(action)
+
+        return priorities
+
+    def prioritized(self, executor: Executor, action: str) -> Executor:
+        """The executor view queuing the endpoint's pages at its priority"""
+        with_priority = getattr(executor, "with_priority", None)
+        if with_priority is None:
+            return executor  # A plain pool: FIFO
+        return with_priority(self.priorities[action])
+
+    def run_endpoint(self, endpoint: dict, executor: Executor) -> None:
+        """Extract and load a single endpoint using the shared executor"""
+        endpoint = deepcopy(endpoint)  # params are mutated while paginating
+
+        resource = endpoint.get("resources", None)
+        action = endpoint.get("action", None)
+        params = endpoint.get("params", None)
+        data_source = endpoint.get("data_source", None)
+        pagination_type = endpoint.get("pagination_type", "per_page")
+        page_label = endpoint.get("page_label", None)
+        total_of_pages_label = endpoint.get("total_of_pages_label", None)
+        records_label = endpoint.get("records_label", "registros")
+        depends_on = endpoint.get("depends_on", None)
+        partitioned = endpoint.get("partitioned", False)
+        natural_key = endpoint.get("natural_key", None)
+
+        pagination = PaginationController(
+            executor=executor,
+            batch_rows=endpoint.get("batch_rows", None),
+            batch_bytes=endpoint.get("batch_bytes", None),
+            tenant=self.tenant,
+        )
+
+        if pagination_type == "date_range" and depends_on:
+            schema = self.tenant.schema if self.tenant else None
+            accounts = Database(schema=schema).select_from_table(
+                table_name=depends_on, distinct_column="nCodCC"
+            )
+            if accounts is None:
+                raise RuntimeError(f"Could not read accounts from '{depends_on}'")
+
+            for account in accounts:
+                params["nCodCC"] = account
+                pagination.pagination(
+                    type=pagination_type,
+                    resource=resource,
+                    action=action,
+                    params=params,
+                    data_source=data_source,
+                    partitioned=partitioned,
+                )
+            pagination.ledger.raise_for_pending(action)
+        else:
+            pagination.pagination(
+                type=pagination_type,
+                resource=resource,
+                action=action,
+                params=params,
+                data_source=data_source,
+                page_label=page_label or "pagina",
+                total_of_pages_label=total_of_pages_label or "total_de_paginas",
+                records_label=records_label,
+                natural_key=natural_key,
+            )
+
+    def run(self, executor: Optional[Executor] = None) -> tuple:
+        """
+        Runs every endpoint respecting dependencies.
+
+        Args:
+            executor (Executor): Fetch pool shared with other schedulers (e.g.
+                one per tenant); when None the run owns a pool of max_workers
+
+        Returns:
+            tuple: (done, failed) sets of actions. Endpoints depending on a
+            failed endpoint are skipped and reported as failed.
+        """
+        pending = set(self.endpoints)
+        running = {}
+        done, failed = set(), set()
+
+        # Every endpoint driver may write at the same time: one connection each
+        get_engine(pool_size=max(len(self.endpoints), settings.DB_POOL_SIZE))
+
+        if executor is not None:
+            fetch_pool = nullcontext(executor)
+        else:
+            fetch_pool = FairExecutor(
+                max_workers=self.max_workers, thread_name_prefix="omie-fetch"
+            )
+            executor = fetch_pool.for_key(
+                self.tenant.name if self.tenant else "default",
+                self.tenant.rate_limiter if self.tenant else None,
+            )
+
+        with fetch_pool, ThreadPoolExecutor(
+            max_workers=max(len(self.endpoints), 1), thread_name_prefix="omie-endpoint"
+        ) as drivers:
+            while pending or running:
+                blocked = {a for a in pending if self.dependencies[a] & failed}
+                while blocked:
+                    for action in blocked:
+                        logger.error(
+                            f"{self.label}Skipping {action}: a dependency has failed"
+                        )
+                    pending -= blocked
+                    failed |= blocked
+                    blocked = {a for a in pending if self.dependencies[a] & failed}
+
+                ready = sorted(
+                    (a for a in pending if self.dependencies[a] <= done),
+                    key=lambda a: self.priorities[a],
+                    reverse=True,
+                )
+                for action in ready:
+                    pending.discard(action)
+                    logger.info(
+                        f"{self.label}Starting {action} (priority {self.priorities[action]})"
+                    )
+                    future = drivers.submit(
+                        self.run_endpoint,
+                        self.endpoints[action],
+                        self.prioritized(executor, action),
+                    )
+                    running[future] = action
+
+                if not running:
+                    break
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    action = running.pop(future)
+                    try:
+                        future.result()
+                        done.add(action)
+                        logger.success(f"{self.label}{action} has finished")
+                    except Exception as e:
+                        failed.add(action)
+                        logger.error(f"{self.label}{action} has failed: {e}")
+
+        if not self.tenant:
+            logger.info(f"Database pool: {pool_stats()}")
+        return done, failed
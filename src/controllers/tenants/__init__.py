@@ -0,0 +1,3 @@
+from src.controllers.scheduler import FairExecutor
+
+from .tenants import TenantsController
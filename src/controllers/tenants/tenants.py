@@ -0,0 +1,91 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Optional
+
+from loguru import logger
+
+from src.config import Settings
+from src.controllers.scheduler import FairExecutor, SchedulerController
+from src.db import Database, get_engine, pool_stats
+from src.tenants import TenantRegistry
+
+settings = Settings()
+
+
+class TenantsController:
+    """
+    Extracts the endpoint catalog for every tenant in one process.
+
+    Each tenant runs its own SchedulerController with its own credentials,
+    rate limit and schema, but all of them fetch through one FairExecutor and
+    write through one database pool. The executor serves the tenants
+    round-robin, so a company with a large backlog cannot starve the others;
+    at most ``concurrency`` tenants are in flight at once.
+    """
+
+    def __init__(
+        self,
+        endpoints: list,
+        registry: Optional[TenantRegistry] = None,
+        max_workers: Optional[int] = None,
+        concurrency: Optional[int] = None,
+    ) -> None:
+        self.endpoints = endpoints
+        self.registry = registry or TenantRegistry.from_file()
+        self.max_workers = max_workers or settings.SCHEDULER_MAX_WORKERS
+        self.concurrency = min(
+            concurrency or settings.TENANT_CONCURRENCY, len(self.registry)
+        )
+
+    def run_tenant(self, tenant, executor: FairExecutor) -> tuple:
+        if tenant.schema:
+            Database(schema=tenant.schema).ensure_schema()
+
+        scheduler = SchedulerController(
+            self.endpoints, max_workers=self.max_workers, tenant=tenant
+        )
+        return scheduler.run(
+            executor=executor.for_key(tenant.name, tenant.rate_limiter)
+        )
+
+    def run(self) -> dict:
+        """
+        Runs every tenant.
+
+        Returns:
+            dict: tenant name -> set of failed actions (empty when it
+            succeeded). A tenant that could not start fails all its endpoints.
+        """
+        # Every endpoint driver of every running tenant may write at once
+        get_engine(
+            pool_size=max(len(self.endpoints) * self.concurrency, settings.DB_POOL_SIZE)
+        )
+
+        failed = {}
+        with FairExecutor(
+            max_workers=self.max_workers, thread_name_prefix="omie-fetch"
+        ) as executor, ThreadPoolExecutor(
+            max_workers=max(self.concurrency, 1), thread_name_prefix="omie-tenant"
+        ) as tenants:
+            futures = {
+                tenants.submit(self.run_tenant, tenant, executor): tenant
+                for tenant in self.registry.get_all()
+            }
+            for future in as_completed(futures):
+                tenant = futures[future]
+                try:
+                    _, failed[tenant.name] = future.result()
+                except Exception as e:
+                    logger.error(f"[{tenant.name}] Tenant has failed: {e}")
+                    failed[tenant.name] = {
+                        endpoint["action"] for endpoint in self.endpoints
+                    }
+
+                if failed[tenant.name]:
+                    logger.error(
+                        f"[{tenant.name}] Failed endpoints: {sorted(failed[tenant.name])}"
+                    )
+                else:
+                    logger.success(f"[{tenant.name}] All endpoints have finished")
+
+        logger.info(f"Database pool: {pool_stats()}")
+        return failed
@@ -1 +1,2 @@
 from .database import Database
+from .engine import dispose_engines, get_engine, pool_stats
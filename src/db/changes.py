@@ -0,0 +1,98 @@
+import hashlib
+import json
+
+import pandas as pd
+
+HASH_COLUMN = "_row_hash"
+EMPTY_VALUES = {"", "None", "nan", "NaN"}
+
+
+def hash_rows(df: pd.DataFrame) -> pd.Series:
+    """
+    Stable content hash per row: the non-empty values keyed by column name,
+    so a column missing from one batch and empty in another hash the same.
+    """
+
+    def text(value) -> str:
+        # A missing value in the batch turns int columns into floats (1 -> 1.0)
+        if isinstance(value, float) and value.is_integer():
+            return str(int(value))
+        return str(value)
+
+    def digest(record: dict) -> str:
+        values = {
+            key: text(value)
+            for key, value in record.items()
+            if key != HASH_COLUMN
+            and value is not None
+            and not (isinstance(value, float) and pd.isna(value))
+            and str(value) not in EMPTY_VALUES
+        }
+        payload = json.dumps(values, sort_keys=True, ensure_ascii=False)
+        return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+    return pd.Series(
+        [digest(record) for record in df.to_dict("records")],
+        index=df.index,
+        dtype=object,
+    )
+
+
+class ChangeSet:
+    """
+    Row-hash bookkeeping for one table during one run.
+
+    Holds the stored hash per natural key, classifies incoming rows as new,
+    changed or unchanged and remembers every key seen, so rows that no longer
+    exist upstream can be deleted once the run is complete.
+    """
+
+    def __init__(self, table_name: str, natural_key: list, existing: dict) -> None:
+        self.table_name = table_name
+        self.natural_key = list(natural_key)
+        self.existing = existing  # key tuple -> stored hash
+        self.seen = set()
+        self.new = 0
+        self.changed = 0
+        self.unchanged = 0
+        self.deleted = 0
+
+    def keys_of(self, df: pd.DataFrame) -> list:
+        return list(df[self.natural_key].astype(str).itertuples(index=False, name=None))
+
+    def classify(self, df: pd.DataFrame) -> tuple:
+        """
+        Returns (batch, rows): the batch deduplicated by natural key and only
+        its rows that are new or whose hash changed. Nothing is recorded until
+        ``commit``, so a batch whose write fails is counted once on retry.
+        """
+        df = df.drop_duplicates(subset=self.natural_key, keep="last")
+
+        write = [
+            self.existing.get(key, False) != row_hash
+            for key, row_hash in zip(self.keys_of(df), df[HASH_COLUMN])
+        ]
+        return df, df[write]
+
+    def commit(self, df: pd.DataFrame) -> None:
+        """Counts a batch once it has been written and records its hashes"""
+        for key, row_hash in zip(self.keys_of(df), df[HASH_COLUMN]):
+            stored = self.existing.get(key, False)
+            self.seen.add(key)
+            if stored is False:
+                self.new += 1
+            elif stored != row_hash:
+                self.changed += 1
+            else:
+                self.unchanged += 1
+            self.existing[key] = row_hash
+
+    def missing(self) -> list:
+        """Stored keys that were not seen in this run"""
+        return [key for key in self.existing if key not in self.seen]
+
+    def summary(self) -> str:
+        return (
+            f"{self.table_name}: {self.new} new, {self.changed} changed, "
+            f"{self.unchanged} unchanged, {self.deleted} deleted"
+        )
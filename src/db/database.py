@@ -1,14 +1,74 @@
-import os
+import re
+from contextlib import contextmanager
+from datetime import date
+from typing import Optional
 
 import pandas as pd
 from loguru import logger
-from sqlalchemy import create_engine, event, text, types
-from sqlalchemy.pool import QueuePool
+from sqlalchemy import text, types
 
 from src.config import Settings
+from src.db.changes import HASH_COLUMN, ChangeSet, hash_rows
+from src.db.engine import get_engine, pool_stats
+from src.utils.tools import is_frozen_period
 
 settings = Settings()
 
+# TODO: Add more numeric columns to the list or make it dynamic
+NUMERIC_COLUMNS = [
+    "nSaldo",
+    "nValorDocumento",
+    "nSaldoAnterior",
+    "nSaldoAtual",
+    "nSaldoConciliado",
+    "nSaldoProvisorio",
+    "nLimiteCreditoTotal",
+    "nSaldoDisponivel",
+]
+
+
+def normalize_content(content) -> pd.DataFrame:
+    """
+    Flattens an API payload into a DataFrame.
+
+    A dict payload is normalized on its list of records, carrying the other
+    top-level keys along as columns; a list is normalized as is.
+    """
+    if isinstance(content, dict):
+        for key, value in content.items():
+            if isinstance(value, list) and value and isinstance(value[0], dict):
+                parent_keys = [k for k in content.keys() if k != key]
+                return pd.json_normalize(content, record_path=key, meta=parent_keys)
+        return pd.DataFrame()
+
+    return pd.json_normalize(content)
+
+
+def coerce_types(df: pd.DataFrame) -> pd.DataFrame:
+    """Converts numeric columns to numbers and everything else to text"""
+    for col in df.columns:
+        if col in NUMERIC_COLUMNS:
+            df[col] = pd.to_numeric(df[col].replace(["", None], "0"), errors="coerce")
+        elif df[col].dtype == "object":
+            df[col] = df[col].astype(str)
+    return df
+
+
+def sql_types(columns) -> dict:
+    """SQLAlchemy types used when writing the given columns"""
+    return {
+        col: types.Numeric(15, 2) if col in NUMERIC_COLUMNS else types.Text()
+        for col in columns
+    }
+
+
+def column_definitions(columns) -> str:
+    """Column list for CREATE TABLE matching sql_types"""
+    return ", ".join(
+        f'"{col}" NUMERIC(15,2)' if col in NUMERIC_COLUMNS else f'"{col}" TEXT'
+        for col in columns
+    )
+
 
 class Database:
     """
@@ -16,55 +76,51 @@ class Database:
     retrieving table columns, updating table structures, and saving data.
     """
 
-    def __init__(self):
+    def __init__(self, schema: Optional[str] = None):
         """
-        Initializes the Database instance, establishing a connection to the database.
+        Initializes the Database instance on the process-wide engine.
 
         Attributes:
-            engine (sqlalchemy.engine.base.Engine): The SQLAlchemy engine used to connect to the database.
-            connection (sqlalchemy.engine.base.Connection): The active connection to the database.
-        """
-        self.engine = self.get_engine()
-        self.connection = self.engine.connect()
-
-    def get_engine(self):
-        """Creates a SQLAlchemy engine with connection pooling"""
-        connection_string = f"postgresql://{settings.DB_USERNAME}:{settings.DB_PASSWORD}@{settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_NAME}"
-        engine = create_engine(
-            connection_string,
-            poolclass=QueuePool,
-            pool_size=5,
-            max_overflow=10,
-            pool_timeout=30,
-            pool_pre_ping=True,
-        )
+            engine (sqlalchemy.engine.base.Engine): The shared SQLAlchemy engine
+                for the configured DSN; its pool is reused by every Database.
+            schema (str): Schema the tables live in (e.g. one per tenant); the
+                connection's default search_path when None.
+        """
+        self.engine = get_engine()
+        self.schema = schema
 
-        # Add event listeners for connection pooling
-        @event.listens_for(engine, "connect")
-        def connect(dbapi_connection, connection_record):
-            connection_record.info["pid"] = os.getpid()
-
-        @event.listens_for(engine, "checkout")
-        def checkout(dbapi_connection, connection_record, connection_proxy):
-            pid = os.getpid()
-            if connection_record.info["pid"] != pid:
-                connection_record.connection = connection_proxy.connection = None
-                from sqlalchemy import exc
-
-                raise exc.DisconnectionError(
-                    "Connection record belongs to pid %s, "
-                    "attempting to check out in pid %s"
-                    % (connection_record.info["pid"], pid)
-                )
+    @contextmanager
+    def begin(self):
+        """
+        Opens a transaction on the shared engine scoped to this schema.
+
+        ``SET LOCAL`` only lasts until the transaction ends, so connections go
+        back to the shared pool without the tenant's search_path.
+        """
+        with self.engine.begin() as connection:
+            if self.schema:
+                connection.execute(text(f'SET LOCAL search_path TO "{self.schema}"'))
+            yield connection
+
+    def ensure_schema(self) -> None:
+        if self.schema:
+            with self.engine.begin() as connection:
+                connection.execute(text(f'CREATE SCHEMA IF NOT EXISTS "{self.schema}"'))
 
-        return engine
+    def pool_stats(self) -> dict:
+        """Pool usage of the shared engine (checked out, overflow, wait time)"""
+        return pool_stats()
 
     def execute_with_transaction(self, query, params=None):
         """Execute a query within a transaction"""
-        with self.engine.begin() as connection:
+        with self.begin() as connection:
             if params:
-                return connection.execute(query, params)
-            return connection.execute(query)
+                result = connection.execute(query, params)
+            else:
+                result = connection.execute(query)
+            # Buffer the rows: the connection goes back to the shared pool
+            # (and to other threads) as soon as this block exits
+            return result.freeze()() if result.returns_rows else result
 
     def get_columns_of_db(self, table_name: str):
         """
@@ -80,7 +136,8 @@ class Database:
             f"""
             SELECT column_name
             FROM information_schema.columns
-            WHERE table_name = '{table_name}';
+            WHERE table_name = '{table_name}'
+            AND table_schema = current_schema();
         """
         )
         result = self.execute_with_transaction(query)
@@ -90,7 +147,7 @@ class Database:
         """Updates table structure to match new columns"""
         try:
             existing_columns = self.get_columns_of_db(table_name)
-            with self.engine.begin() as connection:
+            with self.begin() as connection:
                 for column in new_columns:
                     if column not in existing_columns:
                         alter_query = text(
@@ -117,80 +174,306 @@ class Database:
 
         try:
             # Convert content to DataFrame
-            if isinstance(content, dict):
-                for key, value in content.items():
-                    if isinstance(value, list) and value and isinstance(value[0], dict):
-                        parent_keys = [k for k in content.keys() if k != key]
-                        df = pd.json_normalize(
-                            content, record_path=key, meta=parent_keys
-                        )
-            else:
-                df = pd.json_normalize(content)
-
-            # Convert numeric columns to appropriate types
-            # TODO: Add more numeric columns to the list or make it dynamic
-            numeric_columns = [
-                "nSaldo",
-                "nValorDocumento",
-                "nSaldoAnterior",
-                "nSaldoAtual",
-                "nSaldoConciliado",
-                "nSaldoProvisorio",
-                "nLimiteCreditoTotal",
-                "nSaldoDisponivel",
-            ]
-
-            for col in df.columns:
-                if col in numeric_columns and col in df.columns:
-                    df[col] = pd.to_numeric(
-                        df[col].replace(["", None], "0"), errors="coerce"
-                    )
-                elif df[col].dtype == "object":
-                    df[col] = df[col].astype(str)
+            df = coerce_types(normalize_content(content))
 
             # Create table with correct column types if it doesn't exist
             if replace or not self.table_exists(table_name):
-                with self.engine.begin() as connection:
+                with self.begin() as connection:
                     # Drop table if replacing
                     if replace and self.table_exists(table_name):
                         connection.execute(text(f"DROP TABLE IF EXISTS {table_name}"))
 
-                    # Create column definitions
-                    columns = []
-                    for col in df.columns:
-                        if col in numeric_columns:
-                            columns.append(f'"{col}" NUMERIC(15,2)')
-                        else:
-                            columns.append(f'"{col}" TEXT')
-
-                    create_table_sql = f"CREATE TABLE IF NOT EXISTS {table_name} ({', '.join(columns)})"
+                    create_table_sql = f"CREATE TABLE IF NOT EXISTS {table_name} ({column_definitions(df.columns)})"
                     connection.execute(text(create_table_sql))
 
             # Define SQLAlchemy types for columns
-            dtype = {}
-            for col in df.columns:
-                if col in numeric_columns:
-                    dtype[col] = types.Numeric(15, 2)
-                else:
-                    dtype[col] = types.Text()
-
-            # Use SQLAlchemy engine directly for better performance
+            dtype = sql_types(df.columns)
+
+            with self.begin() as connection:
+                df.to_sql(
+                    table_name,
+                    connection,
+                    if_exists="append",
+                    index=False,
+                    method="multi",
+                    chunksize=1000,
+                    dtype=dtype,
+                )
+
+            logger.success(
+                f"{'Replaced' if replace else 'Appended'} data into table {table_name} starting from page {page}"
+            )
+
+        except Exception as e:
+            logger.error(f"Error saving data into table {table_name}: {e}")
+            raise
+
+    def load_changes(self, resource: str, natural_key: list) -> ChangeSet:
+        """
+        Loads the stored row hashes of a resource keyed by its natural key.
+
+        Rows written before change detection was enabled have no hash yet and
+        are rewritten once on the next run.
+        """
+        table_name = resource.split("/")[-2]
+        existing = {}
+
+        if self.table_exists(table_name):
+            self.update_table_structure(table_name, natural_key + [HASH_COLUMN])
+            # Tables created before change detection have no index on the key
+            with self.begin() as connection:
+                self.create_natural_key_index(connection, table_name, natural_key)
+            columns = ", ".join(f'"{col}"' for col in natural_key + [HASH_COLUMN])
+            result = self.execute_with_transaction(
+                text(f"SELECT {columns} FROM {table_name}")
+            )
+            for row in result:
+                existing[tuple(str(value) for value in row[:-1])] = row[-1]
+
+        return ChangeSet(table_name, natural_key, existing)
+
+    def create_natural_key_index(
+        self, connection, table_name: str, natural_key: list
+    ) -> None:
+        """Index used by merge_rows to match staged rows by natural key"""
+        keys = ", ".join(f'"{col}"' for col in natural_key)
+        connection.execute(
+            text(
+                f"CREATE INDEX IF NOT EXISTS {table_name}_natural_key ON {table_name} ({keys})"
+            )
+        )
+
+    def merge_rows(
+        self, table_name: str, df: pd.DataFrame, natural_key: list, insert: bool = True
+    ):
+        """Deletes the rows matching df's natural keys and, if insert, inserts df"""
+        staging = f"{table_name}_changes"
+        join = " AND ".join(f't."{col}" = s."{col}"' for col in natural_key)
+        with self.begin() as connection:
             df.to_sql(
-                table_name,
-                self.engine,
-                if_exists="append",
+                staging,
+                connection,
+                if_exists="replace",
                 index=False,
                 method="multi",
                 chunksize=1000,
-                dtype=dtype,
+                dtype=sql_types(df.columns),
+            )
+            connection.execute(
+                text(f"DELETE FROM {table_name} t USING {staging} s WHERE {join}")
             )
+            if insert:
+                columns = ", ".join(f'"{col}"' for col in df.columns)
+                connection.execute(
+                    text(
+                        f"INSERT INTO {table_name} ({columns}) SELECT {columns} FROM {staging}"
+                    )
+                )
+            connection.execute(text(f"DROP TABLE {staging}"))
+
+    def save_changes(self, page: int, resource: str, content, changes: ChangeSet):
+        """
+        Writes only the new and changed rows of a batch.
+
+        Each row gets a content hash in "_row_hash"; rows whose hash matches the
+        stored one for the same natural key are skipped.
+        """
+        table_name = changes.table_name
+
+        try:
+            df = coerce_types(normalize_content(content))
+            missing = [col for col in changes.natural_key if col not in df.columns]
+            if missing:
+                raise ValueError(f"Natural key columns not found: {missing}")
+
+            df[HASH_COLUMN] = hash_rows(df)
+            df, rows = changes.classify(df)
+
+            if not self.table_exists(table_name):
+                with self.begin() as connection:
+                    connection.execute(
+                        text(
+                            f"CREATE TABLE IF NOT EXISTS {table_name} ({column_definitions(df.columns)})"
+                        )
+                    )
+                    self.create_natural_key_index(
+                        connection, table_name, changes.natural_key
+                    )
+            self.update_table_structure(table_name, df.columns)
+
+            if not rows.empty:
+                self.merge_rows(table_name, rows, changes.natural_key)
+            changes.commit(df)
 
             logger.success(
-                f"{'Replaced' if replace else 'Appended'} data into table {table_name} starting from page {page}"
+                f"Wrote {len(rows)} of {len(df)} rows into table {table_name} starting from page {page}"
             )
 
         except Exception as e:
-            logger.error(f"Error saving data into table {table_name}: {e}")
+            logger.error(f"Error saving changes into table {table_name}: {e}")
+            raise
+
+    def delete_missing(self, changes: ChangeSet) -> int:
+        """Deletes stored rows whose natural key was not seen during the run"""
+        keys = changes.missing()
+        if keys:
+            df = pd.DataFrame(keys, columns=changes.natural_key)
+            self.merge_rows(changes.table_name, df, changes.natural_key, insert=False)
+            for key in keys:
+                del changes.existing[key]
+
+        changes.deleted = len(keys)
+        return len(keys)
+
+    @staticmethod
+    def partition_names(table_name: str, period: date, account=None) -> tuple:
+        """Names of the month partition and of its per-account leaf"""
+        month = f"{table_name}_p{period:%Y_%m}"
+        account = "" if account is None else str(account)
+        return month, f"{month}_a{re.sub(r'[^0-9A-Za-z]', '_', account)}"
+
+    def is_partitioned(self, table_name: str) -> bool:
+        query = text(
+            "SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(:table_name)"
+        )
+        result = self.execute_with_transaction(
+            query, {"table_name": table_name}
+        ).scalar()
+        return bool(result)
+
+    def is_partition_frozen(self, resource: str, period: date, account=None) -> bool:
+        """
+        A partition is frozen once it has been loaded and its month is older
+        than PARTITION_FREEZE_MONTHS; frozen windows are not fetched again.
+        """
+        if not is_frozen_period(period):
+            return False
+
+        _, leaf = self.partition_names(resource.split("/")[-2], period, account)
+        return self.table_exists(leaf)
+
+    def ensure_partitioned_table(self, table_name: str, df: pd.DataFrame) -> None:
+        """Creates the parent table partitioned by "_period" (monthly ranges)"""
+        if self.table_exists(table_name) and not self.is_partitioned(table_name):
+            legacy = f"{table_name}_unpartitioned"
+            logger.warning(
+                f"Table {table_name} is not partitioned, renaming it to {legacy}"
+            )
+            self.execute_with_transaction(
+                text(f"ALTER TABLE {table_name} RENAME TO {legacy}")
+            )
+
+        columns = [col for col in df.columns if col not in ("_period", "_account")]
+        definitions = column_definitions(columns)
+        self.execute_with_transaction(
+            text(
+                f"""
+                CREATE TABLE IF NOT EXISTS {table_name} (
+                    {definitions + ', ' if definitions else ''}
+                    "_period" DATE NOT NULL,
+                    "_account" TEXT NOT NULL
+                ) PARTITION BY RANGE ("_period")
+            """
+            )
+        )
+        self.update_table_structure(table_name, columns)
+
+    def save_partition(self, resource: str, content, period: date, account=None):
+        """
+        Replaces one (period, account) window of a date-windowed resource.
+
+        The parent table is range-partitioned by month on "_period", and each
+        month is list-partitioned by "_account". The window is loaded into a
+        staging table which then takes the place of the old leaf partition in a
+        single transaction, so reloading a month never touches the rest of the
+        history and readers never see a half-loaded window.
+
+        Args:
+            resource (str): The resource identifier
+            content (dict): The API payload for the window
+            period (date): First day of the month being loaded
+            account: Account code (nCodCC) of the window, if any
+        """
+        table_name = resource.split("/")[-2]
+        period = period.replace(day=1)
+        next_period = (
+            period.replace(year=period.year + 1, month=1)
+            if period.month == 12
+            else period.replace(month=period.month + 1)
+        )
+        account_value = "" if account is None else str(account)
+        month, leaf = self.partition_names(table_name, period, account)
+        staging = f"{leaf}_stg"
+
+        try:
+            df = coerce_types(normalize_content(content))
+            df["_period"] = period
+            df["_account"] = account_value
+
+            self.ensure_partitioned_table(table_name, df)
+
+            with self.begin() as connection:
+                connection.execute(
+                    text(
+                        f"""
+                        CREATE TABLE IF NOT EXISTS {month}
+                        PARTITION OF {table_name}
+                        FOR VALUES FROM ('{period}') TO ('{next_period}')
+                        PARTITION BY LIST ("_account")
+                    """
+                    )
+                )
+                connection.execute(text(f"DROP TABLE IF EXISTS {staging}"))
+                connection.execute(
+                    text(
+                        f"CREATE TABLE {staging} (LIKE {table_name} INCLUDING DEFAULTS)"
+                    )
+                )
+
+            if not df.empty:
+                dtype = sql_types(df.columns)
+                dtype["_period"] = types.Date()
+                with self.begin() as connection:
+                    df.to_sql(
+                        staging,
+                        connection,
+                        if_exists="append",
+                        index=False,
+                        method="multi",
+                        chunksize=1000,
+                        dtype=dtype,
+                    )
+
+            # The CHECK matches the partition bounds so ATTACH skips its scan
+            with self.begin() as connection:
+                connection.execute(
+                    text(
+                        f"""
+                        ALTER TABLE {staging} ADD CONSTRAINT {staging}_bounds CHECK (
+                            "_period" >= '{period}' AND "_period" < '{next_period}'
+                            AND "_account" = :account
+                        )
+                    """
+                    ).bindparams(account=account_value)
+                )
+                connection.execute(text(f"DROP TABLE IF EXISTS {leaf}"))
+                connection.execute(text(f"ALTER TABLE {staging} RENAME TO {leaf}"))
+                connection.execute(
+                    text(
+                        f"ALTER TABLE {month} ATTACH PARTITION {leaf} FOR VALUES IN (:account)"
+                    ).bindparams(account=account_value)
+                )
+                connection.execute(
+                    text(f"ALTER TABLE {leaf} DROP CONSTRAINT {staging}_bounds")
+                )
+
+            logger.success(
+                f"Replaced partition {leaf} of {table_name} with {len(df)} rows"
+            )
+
+        except Exception as e:
+            logger.error(f"Error saving partition {leaf} of {table_name}: {e}")
+            self.execute_with_transaction(text(f"DROP TABLE IF EXISTS {staging}"))
             raise
 
     def table_exists(self, table_name: str) -> bool:
@@ -200,6 +483,7 @@ class Database:
             SELECT EXISTS (
                 SELECT FROM information_schema.tables
                 WHERE table_name = :table_name
+                AND table_schema = current_schema()
             )
         """
         )
@@ -221,13 +505,3 @@ class Database:
         except Exception as e:
             logger.error(f"Error selecting data from table {table_name}: {e}")
             return None
-
-    def __del__(self):
-        """Ensure proper cleanup of database connections"""
-        try:
-            if hasattr(self, "connection"):
-                self.connection.close()
-            if hasattr(self, "engine"):
-                self.engine.dispose()
-        except:
-            pass
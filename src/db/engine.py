@@ -0,0 +1,134 @@
+import atexit
+import os
+import threading
+import time
+from typing import Optional
+
+from loguru import logger
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.pool import QueuePool
+
+from src.config import Settings
+
+settings = Settings()
+
+_engines = {}
+_lock = threading.Lock()
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long checkouts wait for a connection"""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self._wait_lock = threading.Lock()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - started
+            with self._wait_lock:
+                self.wait_count += 1
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+
+
+def get_dsn() -> str:
+    return f"postgresql://{settings.DB_USERNAME}:{settings.DB_PASSWORD}@{settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_NAME}"
+
+
+def get_engine(dsn: Optional[str] = None, pool_size: Optional[int] = None):
+    """
+    Returns the process-wide engine for a DSN, creating it on first use.
+
+    Every Database shares this engine and its pool. ``pool_size`` only applies
+    when the engine is created; it should match the number of concurrent
+    writers (defaults to DB_POOL_SIZE).
+    """
+    dsn = dsn or get_dsn()
+    with _lock:
+        engine = _engines.get(dsn)
+        if engine is None:
+            engine = create_engine(
+                dsn,
+                poolclass=TimedQueuePool,
+                pool_size=pool_size or settings.DB_POOL_SIZE,
+                max_overflow=settings.DB_MAX_OVERFLOW,
+                pool_timeout=30,
+                pool_pre_ping=True,
+            )
+            add_pid_guard(engine)
+            _engines[dsn] = engine
+        return engine
+
+
+def add_pid_guard(engine) -> None:
+    """Invalidates connections checked out in a process that did not open them"""
+
+    @event.listens_for(engine, "connect")
+    def connect(dbapi_connection, connection_record):
+        connection_record.info["pid"] = os.getpid()
+
+    @event.listens_for(engine, "checkout")
+    def checkout(dbapi_connection, connection_record, connection_proxy):
+        pid = os.getpid()
+        if connection_record.info["pid"] != pid:
+            connection_record.connection = connection_proxy.connection = None
+            raise exc.DisconnectionError(
+                "Connection record belongs to pid %s, "
+                "attempting to check out in pid %s"
+                % (connection_record.info["pid"], pid)
+            )
+
+
+def pool_stats(dsn: Optional[str] = None) -> dict:
+    """Current pool usage and accumulated checkout wait times of an engine"""
+    engine = _engines.get(dsn or get_dsn())
+    if engine is None:
+        return {}
+
+    pool = engine.pool
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "wait_count": pool.wait_count,
+        "wait_total": round(pool.wait_total, 3),
+        "wait_max": round(pool.wait_max, 3),
+    }
+
+
+def dispose_engines() -> None:
+    """Closes every pooled connection and forgets the engines (at exit)"""
+    with _lock:
+        engines = list(_engines.values())
+        _engines.clear()
+
+    for engine in engines:
+        try:
+            engine.dispose()
+        except Exception as e:
+            logger.warning(f"Error disposing database engine: {e}")
+
+
+def reset_after_fork() -> None:
+    """
+    Gives a forked child fresh pools. The parent's connections are dropped
+    without being closed, so the parent can keep using them. No lock is taken
+    here: it may have been held by another thread at fork time.
+    """
+    global _lock
+    _lock = threading.Lock()
+    for engine in list(_engines.values()):
+        engine.dispose(close=False)
+
+
+atexit.register(dispose_engines)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=reset_after_fork)
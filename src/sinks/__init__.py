@@ -0,0 +1,3 @@
+from .base import Sink, get_sinks
+from .parquet import ParquetSink, read_dataset
+from .postgres import PostgresSink
@@ -0,0 +1,76 @@
+import os
+from abc import ABC, abstractmethod
+from datetime import date
+from typing import Optional
+
+from src.config import Settings
+
+settings = Settings()
+
+
+class Sink(ABC):
+    """Destination that PaginationController writes fetched records to"""
+
+    @abstractmethod
+    def write_batch(
+        self, page: int, resource: str, content, replace: bool = False
+    ) -> None:
+        """
+        Writes a batch of records of a paginated resource.
+
+        Args:
+            page (int): The page number or batch start page
+            resource (str): The resource identifier
+            content (list | dict): The records (or API payload) to write
+            replace (bool): Whether this is the first batch of the run and
+                previous data of the resource must be replaced
+        """
+
+    @abstractmethod
+    def write_window(self, resource: str, content, period: date, account=None) -> None:
+        """Replaces the (period, account) window of a date-windowed resource"""
+
+    def begin(self, resource: str, natural_key: Optional[list] = None) -> None:
+        """Called before the first batch of a paginated resource"""
+
+    def finish(self, resource: str, complete: bool) -> None:
+        """Called after the last batch; ``complete`` is False if pages are missing"""
+
+    def is_window_frozen(self, resource: str, period: date, account=None) -> bool:
+        """Whether the window is already stored and must not be fetched again"""
+        return False
+
+    def close(self) -> None:
+        pass
+
+
+def get_sinks(tenant=None) -> list:
+    """
+    Builds the sinks listed in settings.SINKS. For a tenant, Postgres writes
+    into the tenant's schema and Parquet under a directory named after it.
+    """
+    from src.db import Database
+
+    from .parquet import ParquetSink
+    from .postgres import PostgresSink
+
+    available = {"postgres": PostgresSink, "parquet": ParquetSink}
+    if tenant is not None:
+        available = {
+            "postgres": lambda: PostgresSink(Database(schema=tenant.schema)),
+            "parquet": lambda: ParquetSink(
+                root=os.path.join(settings.PARQUET_PATH, tenant.name)
+            ),
+        }
+
+    sinks = []
+    for name in settings.SINKS.split(","):
+        name = name.strip().lower()
+        if not name:
+            continue
+        if name not in available:
+            raise ValueError(
+                f"Unknown sink '{name}', expected one of {list(available)}"
+            )
+        sinks.append(available[name]())
+    return sinks
@@ -0,0 +1,238 @@
+import glob
+import os
+import shutil
+import uuid
+from datetime import date
+from typing import Optional
+
+import pandas as pd
+from loguru import logger
+
+from src.config import Settings
+from src.db.database import NUMERIC_COLUMNS, normalize_content
+from src.utils.tools import get_table_name, is_frozen_period
+
+from .base import Sink
+
+settings = Settings()
+
+COMMON_METADATA = "_common_metadata"
+
+
+def arrow_type(column: str):
+    """Arrow type of a column, mirroring sql_types for the Postgres tables"""
+    import pyarrow as pa
+
+    return pa.float64() if column in NUMERIC_COLUMNS else pa.string()
+
+
+def to_text(value):
+    """Text value of a field; missing values stay null"""
+    if value is None or isinstance(value, float) and pd.isna(value):
+        return None
+    # A missing value in the batch turns int columns into floats (1 -> 1.0)
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def read_dataset(path: str):
+    """
+    Reads a dataset written by ParquetSink (e.g. <PARQUET_PATH>/<tenant>/<table>)
+    as an Arrow table with every column, using its _common_metadata schema
+    plus the hive partition columns. Columns missing from older files are null.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+
+    discovered = ds.dataset(path, format="parquet", partitioning="hive")
+    metadata = os.path.join(path, COMMON_METADATA)
+    if not os.path.exists(metadata):
+        return discovered.to_table()
+
+    schema = pa.unify_schemas(
+        [pq.read_schema(metadata), discovered.partitioning.schema]
+    )
+    return ds.dataset(
+        path, format="parquet", schema=schema, partitioning="hive"
+    ).to_table()
+
+
+class ParquetSink(Sink):
+    """
+    Writes one Parquet dataset per resource, hive-partitioned on disk:
+
+        <root>/<table>/run_date=YYYY-MM-DD/part-*.parquet       (paginated)
+        <root>/<table>/period=YYYY-MM/account=<nCodCC>/*.parquet  (date windows)
+
+    Every batch becomes its own zstd-compressed file, so memory stays bounded
+    by the batch and nothing is rewritten until the next replace. The schema
+    of every table is kept in <root>/<table>/_common_metadata; read datasets
+    with ``read_dataset`` so columns added by later batches are not dropped.
+    """
+
+    def __init__(
+        self,
+        root: Optional[str] = None,
+        compression: str = "zstd",
+        row_group_size: int = 50_000,
+    ) -> None:
+        try:
+            import pyarrow  # noqa: F401
+            import pyarrow.parquet  # noqa: F401
+        except ImportError as e:
+            raise ImportError(
+                "ParquetSink requires pyarrow, install it with `pip install pyarrow`"
+            ) from e
+
+        self.root = root or settings.PARQUET_PATH
+        self.compression = compression
+        self.row_group_size = row_group_size
+        self.run_date = date.today().isoformat()
+        self.schemas = {}  # table name -> schema of its dataset
+        self.written_schemas = {}  # table name -> schema in its _common_metadata
+
+    def dataset_schema(self, table_name: str, columns) -> "pyarrow.Schema":
+        """
+        The schema every file of a table's dataset is written with. Types are
+        declared, not inferred per batch (numbers for NUMERIC_COLUMNS, text for
+        everything else, like the Postgres tables), so files never disagree.
+        Columns only ever get added, after those of the files already on disk.
+        """
+        import pyarrow as pa
+
+        schema = self.schemas.get(table_name)
+        if schema is None:
+            schema = pa.schema(
+                [
+                    pa.field(name, arrow_type(name))
+                    for name in self.stored_columns(table_name)
+                ]
+            )
+
+        known = set(schema.names)
+        for col in map(str, columns):
+            if col not in known:
+                schema = schema.append(pa.field(col, arrow_type(col)))
+                known.add(col)
+
+        self.schemas[table_name] = schema
+        return schema
+
+    def stored_columns(self, table_name: str) -> list:
+        """
+        Columns already in the dataset, in order: those of its _common_metadata
+        or, for datasets written without one, of every file in path order.
+        """
+        import pyarrow.parquet as pq
+
+        directory = os.path.join(self.root, table_name)
+        metadata = os.path.join(directory, COMMON_METADATA)
+        if os.path.exists(metadata):
+            return pq.read_schema(metadata).names
+
+        columns = {}
+        files = glob.glob(os.path.join(directory, "**", "*.parquet"), recursive=True)
+        for file in sorted(files):
+            columns.update(dict.fromkeys(pq.read_schema(file).names))
+        return list(columns)
+
+    def write_common_metadata(self, table_name: str) -> None:
+        """
+        Stores the dataset schema in <root>/<table>/_common_metadata whenever
+        it gained columns. Files written before a column appeared lack it, and
+        readers that infer the schema from one file would drop it; read through
+        ``read_dataset`` (or pass this schema) to get every column.
+        """
+        import pyarrow.parquet as pq
+
+        schema = self.schemas[table_name]
+        if self.written_schemas.get(table_name) == schema:
+            return
+
+        directory = os.path.join(self.root, table_name)
+        temporary = os.path.join(directory, f".{COMMON_METADATA}.tmp")
+        pq.write_metadata(schema, temporary)
+        os.replace(temporary, os.path.join(directory, COMMON_METADATA))
+        self.written_schemas[table_name] = schema
+
+    def to_arrow(self, content, table_name: str):
+        """Builds an Arrow table with the dataset schema of ``table_name``"""
+        import pyarrow as pa
+
+        df = normalize_content(content)
+        df.columns = [str(col) for col in df.columns]
+        schema = self.dataset_schema(table_name, df.columns)
+
+        arrays = []
+        for field in schema:
+            if field.name not in df.columns:
+                arrays.append(pa.nulls(len(df), type=field.type))
+            elif field.name in NUMERIC_COLUMNS:
+                series = pd.to_numeric(
+                    df[field.name].replace(["", None], "0"), errors="coerce"
+                )
+                arrays.append(pa.array(series, type=field.type, from_pandas=True))
+            else:
+                values = [to_text(value) for value in df[field.name]]
+                arrays.append(pa.array(values, type=field.type))
+
+        return pa.Table.from_arrays(arrays, schema=schema)
+
+    def write_table(
+        self, directory: str, table_name: str, content, replace: bool
+    ) -> int:
+        import pyarrow.parquet as pq
+
+        if replace and os.path.isdir(directory):
+            shutil.rmtree(directory)
+        os.makedirs(directory, exist_ok=True)
+
+        table = self.to_arrow(content, table_name)
+        if table.num_rows == 0:
+            return 0
+
+        # Write to a hidden temp file first so readers never see partial files
+        name = f"part-{uuid.uuid4().hex}.parquet"
+        temporary = os.path.join(directory, f".{name}.tmp")
+        pq.write_table(
+            table,
+            temporary,
+            compression=self.compression,
+            row_group_size=self.row_group_size,
+        )
+        os.replace(temporary, os.path.join(directory, name))
+        self.write_common_metadata(table_name)
+        return table.num_rows
+
+    def window_directory(self, resource: str, period: date, account=None) -> str:
+        directory = os.path.join(
+            self.root, get_table_name(resource), f"period={period:%Y-%m}"
+        )
+        if account is not None:
+            directory = os.path.join(directory, f"account={account}")
+        return directory
+
+    def write_batch(
+        self, page: int, resource: str, content, replace: bool = False
+    ) -> None:
+        directory = os.path.join(
+            self.root, get_table_name(resource), f"run_date={self.run_date}"
+        )
+        rows = self.write_table(directory, get_table_name(resource), content, replace)
+        logger.success(
+            f"{'Replaced' if replace else 'Appended'} {rows} rows into {directory} starting from page {page}"
+        )
+
+    def write_window(self, resource: str, content, period: date, account=None) -> None:
+        directory = self.window_directory(resource, period, account)
+        rows = self.write_table(
+            directory, get_table_name(resource), content, replace=True
+        )
+        logger.success(f"Replaced {directory} with {rows} rows")
+
+    def is_window_frozen(self, resource: str, period: date, account=None) -> bool:
+        return is_frozen_period(period) and os.path.isdir(
+            self.window_directory(resource, period, account)
+        )
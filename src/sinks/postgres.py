@@ -0,0 +1,56 @@
+from datetime import date
+from typing import Optional
+
+from loguru import logger
+
+from src.db import Database
+from src.utils.tools import get_table_name
+
+from .base import Sink
+
+
+class PostgresSink(Sink):
+    """Writes into PostgreSQL through Database"""
+
+    def __init__(self, db: Optional[Database] = None) -> None:
+        self.db = db or Database()
+        self.changes = {}  # table name -> ChangeSet, for resources with a natural key
+
+    def begin(self, resource: str, natural_key: Optional[list] = None) -> None:
+        if natural_key:
+            self.changes[get_table_name(resource)] = self.db.load_changes(
+                resource, natural_key
+            )
+
+    def write_batch(
+        self, page: int, resource: str, content, replace: bool = False
+    ) -> None:
+        changes = self.changes.get(get_table_name(resource))
+        if changes is not None:
+            # Incremental: the table is never replaced, only changed rows are written
+            self.db.save_changes(page, resource, content, changes)
+        else:
+            self.db.save_into_db(page, resource, content, replace=replace)
+
+    def finish(self, resource: str, complete: bool) -> None:
+        changes = self.changes.pop(get_table_name(resource), None)
+        if changes is None:
+            return
+
+        if complete and not changes.seen:
+            logger.warning(
+                f"{changes.table_name}: no rows were fetched, stored rows are kept"
+            )
+        elif complete:
+            self.db.delete_missing(changes)
+        else:
+            logger.warning(
+                f"{changes.table_name}: run is incomplete, deleted rows are not removed"
+            )
+        logger.info(changes.summary())
+
+    def write_window(self, resource: str, content, period: date, account=None) -> None:
+        self.db.save_partition(resource, content, period, account)
+
+    def is_window_frozen(self, resource: str, period: date, account=None) -> bool:
+        return self.db.is_partition_frozen(resource, period, account)
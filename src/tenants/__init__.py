@@ -0,0 +1,2 @@
+from .rate_limiter import RateLimiter
+from .tenants import Tenant, TenantRegistry
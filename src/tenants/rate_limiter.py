@@ -0,0 +1,45 @@
+import threading
+import time
+from typing import Optional
+
+
+class RateLimiter:
+    """
+    Token bucket allowing ``requests_per_minute`` calls, in bursts of up to
+    ``burst``. Omie limits requests per app_key, so each tenant has its own.
+    A rate of 0 disables limiting.
+    """
+
+    def __init__(self, requests_per_minute: int, burst: Optional[int] = None) -> None:
+        self.rate = requests_per_minute / 60
+        self.capacity = burst or max(requests_per_minute // 6, 1)
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> float:
+        """
+        Takes a token without blocking. Returns 0 when one was taken, otherwise
+        the seconds until the next token is available.
+        """
+        if not self.rate:
+            return 0
+
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated_at) * self.rate
+            )
+            self.updated_at = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.rate
+
+    def acquire(self) -> None:
+        """Blocks until a request may be sent"""
+        while True:
+            wait = self.try_acquire()
+            if not wait:
+                return
+            time.sleep(wait)
@@ -0,0 +1,74 @@
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Optional
+
+from src.config import Settings
+
+from .rate_limiter import RateLimiter
+
+settings = Settings()
+
+
+@dataclass
+class Tenant:
+    """An Omie company: its credentials and where its data is stored"""
+
+    name: str
+    app_key: str
+    app_secret: str
+    schema: Optional[str] = None  # Postgres schema; the default search_path if None
+    requests_per_minute: int = settings.TENANT_REQUESTS_PER_MINUTE
+    rate_limiter: RateLimiter = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        if not self.app_key or not self.app_secret:
+            raise ValueError(f"Tenant '{self.name}' is missing app_key or app_secret")
+        self.rate_limiter = RateLimiter(self.requests_per_minute)
+
+    @classmethod
+    def from_settings(cls) -> "Tenant":
+        """The single company configured through APP_KEY / APP_SECRET"""
+        if not settings.APP_KEY or not settings.APP_SECRET:
+            raise ValueError(
+                f"Set APP_KEY and APP_SECRET or list the tenants in {settings.TENANTS_FILE}"
+            )
+        return cls(
+            name="default", app_key=settings.APP_KEY, app_secret=settings.APP_SECRET
+        )
+
+
+class TenantRegistry:
+    """
+    The companies extracted in a run, read from a JSON list such as:
+
+        [{"name": "acme", "app_key": "...", "app_secret": "...", "schema": "acme"}]
+
+    Falls back to the single company from the settings when the file is missing.
+    """
+
+    def __init__(self, tenants: list) -> None:
+        names = [tenant.name for tenant in tenants]
+        duplicated = {name for name in names if names.count(name) > 1}
+        if duplicated:
+            raise ValueError(f"Duplicated tenant names: {sorted(duplicated)}")
+        self.tenants = {tenant.name: tenant for tenant in tenants}
+
+    @classmethod
+    def from_file(cls, path: Optional[str] = None) -> "TenantRegistry":
+        path = path or settings.TENANTS_FILE
+        if not os.path.exists(path):
+            return cls([Tenant.from_settings()])
+
+        with open(path, "r") as file:
+            entries = json.load(file)
+        return cls([Tenant(**entry) for entry in entries])
+
+    def get(self, name: str) -> Tenant:
+        return self.tenants[name]
+
+    def get_all(self) -> list:
+        return list(self.tenants.values())
+
+    def __len__(self) -> int:
+        return len(self.tenants)
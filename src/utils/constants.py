@@ -1 +1,11 @@
 HEADERS = {"Content-Type": "application/json"}
+
+# Fields removed from every fetched record
+BLACK_LIST = [
+    "tags",
+    "recomendacoes",
+    "homepage",
+    "fax_ddd",
+    "bloquear_exclusao",
+    "produtor_rural",
+]
@@ -1,26 +1,49 @@
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional
 
-from src.api import Api
+from src.api import Api, ApiResponseError
 from src.config import Settings
-from src.utils.constants import HEADERS
+from src.tenants import Tenant
+from src.utils.constants import BLACK_LIST, HEADERS
 
 settings = Settings()
 
 
+def get_table_name(resource: str) -> str:
+    return resource.split("/")[-2]
+
+
+def remove_blacklisted_fields(contents: list) -> list:
+    """Removes BLACK_LIST fields from every record, in place"""
+    for content in contents:
+        for item in BLACK_LIST:
+            if item in content:
+                del content[item]
+    return contents
+
+
 def get_body_params_pagination(
     action: str,
     params: dict,
     page: Optional[int] = None,
     field_pagination: Optional[str] = None,
+    tenant: Optional[Tenant] = None,
 ) -> dict:
     if field_pagination:
         params[field_pagination] = page
 
+    # Credentials of the tenant being extracted, or the single configured company
+    app_key = tenant.app_key if tenant else settings.APP_KEY
+    app_secret = tenant.app_secret if tenant else settings.APP_SECRET
+    if not app_key or not app_secret:
+        raise ValueError(
+            "Missing Omie credentials: set APP_KEY and APP_SECRET or run per tenant"
+        )
+
     return {
         "call": action,
-        "app_key": settings.APP_KEY,
-        "app_secret": settings.APP_SECRET,
+        "app_key": app_key,
+        "app_secret": app_secret,
         "param": [params],
     }
 
@@ -32,6 +55,7 @@ def get_total_of_pages(
     page_label: Optional[str] = None,
     total_of_pages_label: Optional[str] = None,
     records_label: Optional[str] = None,
+    tenant: Optional[Tenant] = None,
 ) -> int:
     page_label = "pagina" if page_label is None else page_label
     total_of_pages_label = (
@@ -39,7 +63,9 @@ def get_total_of_pages(
     )
     records_label = "registros" if records_label is None else records_label
 
-    payload = get_body_params_pagination(action, params, 1, page_label)
+    payload = get_body_params_pagination(action, params, 1, page_label, tenant)
+    if tenant:
+        tenant.rate_limiter.acquire()
 
     api = Api(
         url=f"{settings.BASE_URL}{resource}",
@@ -48,11 +74,23 @@ def get_total_of_pages(
         params=params,
     )
     response = api.request(api.post)
+    if not isinstance(response, dict):
+        raise ApiResponseError(f"Unexpected response: {str(response)[:200]}")
     total_of_pages = response.get(total_of_pages_label, 0)
 
     return total_of_pages
 
 
+def is_frozen_period(period: date) -> bool:
+    """True when the month is older than PARTITION_FREEZE_MONTHS (0 never freezes)"""
+    if not settings.PARTITION_FREEZE_MONTHS:
+        return False
+
+    today = date.today()
+    age_in_months = (today.year - period.year) * 12 + today.month - period.month
+    return age_in_months >= settings.PARTITION_FREEZE_MONTHS
+
+
 def generate_date_range(start_date_str: str):
     def add_month(data):
         new_month = data.month + 1